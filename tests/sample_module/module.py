@@ -156,3 +156,9 @@ class BookOverride(metaclass=PoolMeta):
         final_test_annotate: Record["ir.model"] = ...
         final_test_annotate.fields[0].name
         final_test_annotate.fields[0].whatever
+        reassigned = self_record
+        reassigned = 1
+        reassigned.whatever
+        reassigned_list = self_records
+        reassigned_list = reassigned + 1
+        [y.whatever for y in reassigned_list]
@@ -1,20 +1,76 @@
-import os
+import multiprocessing
+import shutil
+from collections import Counter
+from collections.abc import Generator
 from pathlib import Path
+from typing import Any
 
+import pytest
 import trytond
 from lsprotocol.types import CompletionItemKind
 
-trytond_path = (
-    Path(os.path.dirname(os.path.abspath(trytond.__file__))) / "modules"
+from tryton_analyzer.parsing import ParsedPythonFile
+from tryton_analyzer.pool import PoolManager
+from tryton_analyzer.tryton_lint import (
+    get_module_diagnostics,
+    print_modules_diagnostics,
 )
-sample_module_path = (
-    Path(os.path.dirname(os.path.abspath(__file__))) / "sample_module"
-)
-if not os.path.exists(trytond_path / "sample_module"):
+
+trytond_path = Path(trytond.__file__).resolve().parent / "modules"
+sample_module_path = Path(__file__).resolve().parent / "sample_module"
+try:
     (trytond_path / "sample_module").symlink_to(sample_module_path)
+except FileExistsError:
+    # Already linked, possibly by another test worker
+    pass
+
+# Expected (sorted) field completions on the sample module's models
+AUTHOR_FIELDS = (
+    "books",
+    "create_date",
+    "create_uid",
+    "id",
+    "name",
+    "rec_name",
+    "write_date",
+    "write_uid",
+)
+BOOK_FIELDS = (
+    "author",
+    "create_date",
+    "create_uid",
+    "id",
+    "name",
+    "rec_name",
+    "write_date",
+    "write_uid",
+)
+
+
+@pytest.fixture(scope="session")
+def pool_manager() -> Generator[PoolManager, None, None]:
+    # Loading the pools / parsing the module is the costly part, share it
+    # between all the tests
+    manager = PoolManager()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture(scope="session")
+def sample_module_parsed(pool_manager: PoolManager) -> ParsedPythonFile:
+    # Parsed once, then shared between the completion tests
+    parsed = pool_manager.get_parsed(sample_module_path / "module.py")
+    assert isinstance(parsed, ParsedPythonFile)
+    return parsed
+
 
+@pytest.fixture(scope="session")
+def sample_module_diagnostics(pool_manager: PoolManager) -> list[Any]:
+    # Analyzing the module is costly, do it once for all the tests
+    return list(pool_manager.generate_module_diagnostics("sample_module"))
 
-def test_diagnostics() -> None:
+
+def test_diagnostics(sample_module_diagnostics: list[Any]) -> None:
     expected_errors = [
         # Non registered class
         ("0001", "module.py", 7),
@@ -80,6 +136,8 @@ def test_diagnostics() -> None:
         ("1006", "module.py", 155),
         # Could not find field on variable whose model comes from an annotation
         ("1007", "module.py", 158),
+        # Nothing on lines 161 / 164: variables assigned a literal or an
+        # operation lose their previous model
         # Record not in a data tag
         ("5002", "module.xml", 2),
         # Unknown model in this data block
@@ -101,93 +159,100 @@ def test_diagnostics() -> None:
         # Unregistered xml file
         ("5001", "unregistered.xml", 1),
     ]
-    from tryton_analyzer.pool import PoolManager
+    # Some lines hold the same error more than once, so compare multisets
+    expected = Counter(expected_errors)
+    actual = Counter(
+        (x.err_code, x._filepath.name, x._position.start.line)
+        for x in sample_module_diagnostics
+    )
+    print("Missing:", sorted((expected - actual).elements()))
+    print("Unexpected:", sorted((actual - expected).elements()))
+    assert actual == expected
+
 
-    diagnostics = sorted(
-        PoolManager().generate_module_diagnostics("sample_module"),
-        key=lambda x: (x._filepath.parts[-1], x._position.start.line),
+def test_xml_diagnostics_follow_tryton_cfg(
+    pool_manager: PoolManager, tmp_path: Path
+) -> None:
+    # Work on a copy, so that the other tests still see the original module
+    module_path = tmp_path / "sample_module"
+    shutil.copytree(
+        sample_module_path,
+        module_path,
+        ignore=shutil.ignore_patterns("__pycache__"),
     )
+    xml_path = module_path / "registered_typo.xml"
+    cfg_path = module_path / "tryton.cfg"
 
-    for (err_code, filename, err_line), diagnostic in zip(
-        expected_errors, diagnostics
-    ):
-        print(diagnostic)
-        assert filename == diagnostic._filepath.parts[-1]
-        assert err_line == diagnostic._position.start.line
-        assert err_code == diagnostic.err_code
+    def error_codes() -> list[str]:
+        return [
+            x.err_code for x in pool_manager.generate_diagnostics(xml_path)
+        ]
+
+    assert error_codes() == ["5000"]
+    # Once not registered anymore, the file is not expected to be a tryton
+    # xml file
+    cfg_path.write_text(
+        cfg_path.read_text().replace("    registered_typo.xml\n", "")
+    )
+    assert error_codes() == []
 
-    print(diagnostics[len(expected_errors) - 1 :])
-    print(expected_errors[len(diagnostics) - 1 :])
-    assert len(diagnostics) == len(expected_errors)
 
+def test_lint_several_modules(
+    capsys: pytest.CaptureFixture[str], sample_module_diagnostics: list[Any]
+) -> None:
+    children = set(multiprocessing.active_children())
+    print_modules_diagnostics(["sample_module", "res"])
+    lines = capsys.readouterr().out.splitlines()
+    # Modules are printed in the requested order, whichever worker ends first
+    assert lines[0] == "sample_module"
+    assert lines[len(sample_module_diagnostics) + 1] == "res"
+    # The workers were shut down
+    assert set(multiprocessing.active_children()) <= children
+    # Each module's pool manager closes its companion once done
+    get_module_diagnostics("sample_module")
+    assert set(multiprocessing.active_children()) <= children
 
-def test_completion() -> None:
-    from tryton_analyzer.pool import PoolManager
 
+def test_completion(
+    pool_manager: PoolManager, sample_module_parsed: ParsedPythonFile
+) -> None:
     # Test completion on 'self' in AuthorOverride::test_function
     completions = [
         x
-        for x in PoolManager().generate_completions(
-            sample_module_path / "module.py", 65, 14
+        for x in pool_manager.generate_parsed_completions(
+            sample_module_parsed, 65, 14
         )
         if x.kind == CompletionItemKind.Field
     ]
     print(completions)
-    assert sorted(x.label for x in completions) == [
-        "books",
-        "create_date",
-        "create_uid",
-        "id",
-        "name",
-        "rec_name",
-        "write_date",
-        "write_uid",
-    ]
-
+    assert tuple(sorted(x.label for x in completions)) == AUTHOR_FIELDS
 
-def test_completion_after_list_subscription() -> None:
-    from tryton_analyzer.pool import PoolManager
 
+def test_completion_after_list_subscription(
+    pool_manager: PoolManager, sample_module_parsed: ParsedPythonFile
+) -> None:
     # Test completion on 'self' in AuthorOverride::test_function
     completions = [
         x
-        for x in PoolManager().generate_completions(
-            sample_module_path / "module.py", 67, 24
+        for x in pool_manager.generate_parsed_completions(
+            sample_module_parsed, 67, 24
         )
         if x.kind == CompletionItemKind.Field
     ]
     print(completions)
-    assert sorted(x.label for x in completions) == [
-        "author",
-        "create_date",
-        "create_uid",
-        "id",
-        "name",
-        "rec_name",
-        "write_date",
-        "write_uid",
-    ]
+    assert tuple(sorted(x.label for x in completions)) == BOOK_FIELDS
 
 
-def test_completion_in_comprehension() -> None:
-    from tryton_analyzer.pool import PoolManager
-
+def test_completion_in_comprehension(
+    pool_manager: PoolManager, sample_module_parsed: ParsedPythonFile
+) -> None:
     # Test completion on 'self' in AuthorOverride::test_function
     completions = [
         x
-        for x in PoolManager().generate_completions(
-            sample_module_path / "module.py", 72, 22
+        for x in pool_manager.generate_parsed_completions(
+            sample_module_parsed, 72, 22
         )
         if x.kind == CompletionItemKind.Field
     ]
     print(completions)
-    assert sorted(x.label for x in completions) == [
-        "author",
-        "create_date",
-        "create_uid",
-        "id",
-        "name",
-        "rec_name",
-        "write_date",
-        "write_uid",
-    ]
+    assert tuple(sorted(x.label for x in completions)) == BOOK_FIELDS
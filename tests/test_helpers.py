@@ -0,0 +1,252 @@
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+from lsprotocol.types import (
+    CompletionItem,
+    Position,
+    Range,
+    TextDocumentIdentifier,
+)
+
+from tryton_analyzer.pool import Pool, PoolKind, PoolManager
+from tryton_analyzer.tryton_ls import (
+    TrytonServer,
+    fuzzy_score,
+    merge_ranges,
+    rebase_range,
+)
+
+BASE_FIELDS = {
+    "id": {"type": "integer"},
+    "rec_name": {"type": "char"},
+}
+MODELS: dict[str, dict[str, Any]] = {
+    "party": {
+        "name": {"type": "char"},
+        "address": {"type": "many2one", "relation": "address"},
+    },
+    "address": {
+        "zip": {"type": "char"},
+        "country": {"type": "many2one", "relation": "country"},
+        "lost": {"type": "many2one", "relation": "unknown.model"},
+    },
+    "country": {
+        "code": {"type": "char"},
+    },
+}
+
+
+def make_range(
+    start_line: int, start_char: int, end_line: int, end_char: int
+) -> Range:
+    return Range(
+        start=Position(line=start_line, character=start_char),
+        end=Position(line=end_line, character=end_char),
+    )
+
+
+class FakePoolManager:
+    """
+    Answers model requests from MODELS rather than from a companion
+    """
+
+    def __init__(self) -> None:
+        self.fetched: list[str] = []
+
+    def fetch_model(self, key: Any, name: str, kind: PoolKind) -> dict:
+        self.fetched.append(name)
+        fields = {**BASE_FIELDS, **MODELS[name]}
+        return {"attrs": set(), "fields": fields}
+
+
+@pytest.fixture
+def pool_manager() -> FakePoolManager:
+    return FakePoolManager()
+
+
+@pytest.fixture
+def pool(pool_manager: FakePoolManager) -> Pool:
+    return Pool(cast(PoolManager, pool_manager), ("ir",), list(MODELS), [])
+
+
+def test_depends_parents_multiple_hops(pool: Pool) -> None:
+    model, unknown_attr, unknown_relation = pool.resolve_depends_parents(
+        pool.get("party"), "_parent_address._parent_country"
+    )
+    assert (model.name, unknown_attr, unknown_relation) == ("country", "", "")
+
+
+def test_depends_parents_stop_on_non_relation(pool: Pool) -> None:
+    model, unknown_attr, unknown_relation = pool.resolve_depends_parents(
+        pool.get("party"), "_parent_name._parent_country"
+    )
+    assert (model.name, unknown_attr, unknown_relation) == (
+        "party",
+        "name",
+        "",
+    )
+
+
+def test_depends_parents_without_parent_prefix(pool: Pool) -> None:
+    model, unknown_attr, unknown_relation = pool.resolve_depends_parents(
+        pool.get("party"), "_parent_address.country"
+    )
+    assert (model.name, unknown_attr, unknown_relation) == (
+        "address",
+        "country",
+        "",
+    )
+
+
+def test_depends_parents_unknown_relation(pool: Pool) -> None:
+    model, unknown_attr, unknown_relation = pool.resolve_depends_parents(
+        pool.get("party"), "_parent_address._parent_lost"
+    )
+    assert (model.name, unknown_attr, unknown_relation) == (
+        "address",
+        "lost",
+        "unknown.model",
+    )
+
+
+def test_depends_parents_shared_prefix(
+    pool: Pool, pool_manager: FakePoolManager
+) -> None:
+    party = pool.get("party")
+    first = pool.resolve_depends_parents(
+        party, "_parent_address._parent_country"
+    )
+    other = pool.resolve_depends_parents(party, "_parent_address._parent_lost")
+    assert first[0].name == "country"
+    assert other[1] == "lost"
+    # Each model was only loaded once
+    assert sorted(pool_manager.fetched) == ["address", "country", "party"]
+
+
+def test_fuzzy_score_empty_filter() -> None:
+    assert fuzzy_score("", "anything") == 0
+    assert fuzzy_score("", "") == 0
+
+
+def test_fuzzy_score_ordering() -> None:
+    assert fuzzy_score("rec", "read") is None
+    # Prefixes first, then matches at the start of a word
+    assert fuzzy_score("rec", "rec_name") == -1
+    assert fuzzy_score("rec", "get_rec_name") == 3
+    assert fuzzy_score("rec", "getxrec") == 4
+    # Characters skipped between matches are penalized
+    assert fuzzy_score("rec", "rxexc") == 1
+
+
+def test_merge_ranges() -> None:
+    merged = merge_ranges(
+        [
+            make_range(10, 0, 10, 5),
+            # Overlapping
+            make_range(1, 0, 2, 4),
+            make_range(2, 2, 3, 0),
+            # Adjacent
+            make_range(3, 0, 4, 0),
+            # Contained
+            make_range(1, 2, 1, 3),
+        ]
+    )
+    assert merged == [make_range(1, 0, 4, 0), make_range(10, 0, 10, 5)]
+    assert merge_ranges([]) == []
+
+
+def test_rebase_range() -> None:
+    inserted = make_range(5, 0, 5, 0)
+    text = "a\nb\nc\n"
+    # Before the change, left as is
+    assert rebase_range(make_range(1, 0, 2, 3), inserted, text) == (
+        make_range(1, 0, 2, 3)
+    )
+    # After the change, moved by the inserted lines
+    assert rebase_range(make_range(7, 2, 8, 1), inserted, text) == (
+        make_range(10, 2, 11, 1)
+    )
+    # On the same line as the end of the change, columns are moved too
+    assert rebase_range(
+        make_range(2, 4, 2, 6), make_range(2, 0, 2, 2), "x"
+    ) == (make_range(2, 3, 2, 5))
+    # Boundaries in the replaced text are moved to the new text's ones
+    assert rebase_range(
+        make_range(3, 1, 6, 0), make_range(2, 0, 4, 0), "y"
+    ) == make_range(2, 0, 4, 0)
+
+
+class FakeCompletionManager:
+    def __init__(self, labels: list[str]) -> None:
+        self.labels = labels
+        self.calls = 0
+
+    def generate_completions(self, *args: Any, **kwargs: Any) -> list:
+        self.calls += 1
+        return [CompletionItem(label=x) for x in self.labels]
+
+
+@pytest.fixture
+def server(
+    monkeypatch: pytest.MonkeyPatch,
+) -> tuple[TrytonServer, SimpleNamespace]:
+    document = SimpleNamespace(source="", path="/module/a.py", uri="file://a")
+    workspace = SimpleNamespace(get_document=lambda uri: document)
+    monkeypatch.setattr(
+        TrytonServer, "workspace", property(lambda _: workspace)
+    )
+    return TrytonServer(), document
+
+
+def complete(
+    server: TrytonServer, document: SimpleNamespace, text: str
+) -> list[str]:
+    document.source = f"x = 1\n    {text}\n"
+    result = server.generate_completions(
+        TextDocumentIdentifier(uri=document.uri),
+        Position(line=1, character=4 + len(text)),
+    )
+    return [x.label for x in result.items]
+
+
+def test_completion_filter(
+    server: tuple[TrytonServer, SimpleNamespace],
+) -> None:
+    tryton_server, document = server
+    manager = FakeCompletionManager(
+        ["create", "get_rec_name", "read", "rec_name", "write"]
+    )
+    tryton_server._pool_manager = cast(PoolManager, manager)
+    # No filter, everything in the original order
+    assert complete(tryton_server, document, "self.") == manager.labels
+    # The filter is case insensitive
+    assert complete(tryton_server, document, "self.RecN") == [
+        "rec_name",
+        "get_rec_name",
+    ]
+    # A shorter filter is not restricted to the previous matches
+    assert complete(tryton_server, document, "self.Re") == [
+        "read",
+        "rec_name",
+        "create",
+        "get_rec_name",
+        "write",
+    ]
+    # Only the first request reached the pool
+    assert manager.calls == 1
+
+
+def test_completion_truncated(
+    server: tuple[TrytonServer, SimpleNamespace],
+) -> None:
+    tryton_server, document = server
+    manager = FakeCompletionManager([f"field_{i}" for i in range(150)])
+    tryton_server._pool_manager = cast(PoolManager, manager)
+    document.source = "x = 1\n    self.\n"
+    result = tryton_server.generate_completions(
+        TextDocumentIdentifier(uri=document.uri),
+        Position(line=1, character=9),
+    )
+    assert len(result.items) == 100
+    assert result.is_incomplete
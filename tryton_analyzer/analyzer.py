@@ -1,5 +1,7 @@
+import sys
+from bisect import bisect_right
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Optional, cast
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Optional, cast
 
 import libcst as cst
 import libcst.matchers as m
@@ -33,12 +35,53 @@ from .tools import (
     UnknownAttribute,
     UnknownModel,
     UnknownPoolKey,
-    ignore_error_code,
+    ignored_error_codes,
+    node_ignored_error_codes,
+    string_value,
 )
 
 if TYPE_CHECKING:
     from .pool import Pool, PoolKind, PoolManager, PoolModel
 
+# Matchers are immutable, so they are built once rather than for every node
+
+# @fields.depends(...)
+DEPENDS_DECORATOR_MATCHER = m.Decorator(
+    decorator=m.Call(
+        func=m.Attribute(
+            value=m.Name(value="fields"),
+            attr=m.Name(value="depends"),
+        )
+    )
+)
+# "field_name" / "_parent_xxx.yyyy" depends
+DEPENDS_ARG_STRING_MATCHER = m.Arg(value=m.SimpleString(), keyword=None)
+# methods=[...] depends
+DEPENDS_ARG_METHODS_MATCHER = m.Arg(value=m.List(), keyword=m.Name())
+STRING_ELEMENT_MATCHER = m.Element(value=m.SimpleString())
+# __name__ = "..."
+MODEL_NAME_ASSIGN_MATCHER = m.Assign(
+    targets=[m.AssignTarget(target=m.Name(value="__name__"))],
+    value=m.SaveMatchedNode(m.SimpleString(), "__name__"),
+)
+# pool = Pool()
+POOL_ASSIGN_MATCHER = m.Assign(
+    targets=[m.AssignTarget(target=m.SaveMatchedNode(m.Name(), "var_name"))],
+    value=m.Call(func=m.Name(value="Pool")),
+)
+
+# Expressions which may be given a model by the analyzer
+TYPED_EXPRESSION_TYPES = frozenset(
+    (
+        cst.Attribute,
+        cst.Call,
+        cst.Name,
+        cst.Subscript,
+        cst.ListComp,
+        cst.SetComp,
+    )
+)
+
 
 class CompletionTargetFoundError(Exception):
     pass
@@ -55,10 +98,13 @@ class Analyzer:
         self._filename = parsed.get_filename()
         self._filepath = parsed.get_path()
         self._module = parsed.get_module()
-        self._raw_lines = parsed.get_raw_lines()
+        self._parsed_file = parsed
         self._module_path = parsed.get_module_path()
         self._pool_manager = pool_manager
         self._diagnostics: list[Diagnostic] = []
+        # keys: line number
+        # values: error codes ignored on this line
+        self._ignored_codes: dict[int, frozenset[str]] = {}
 
     def add_diagnostic(self, diagnostic: Diagnostic | None) -> None:
         if diagnostic and not self.ignored(
@@ -81,9 +127,17 @@ class Analyzer:
 
     def ignored(self, err_code: str, line_number: int) -> bool:
         # TODO: Improve resiliency
-        return (
-            f"IGNORE-TRYTON-LS-{err_code}" in self._raw_lines[line_number - 1]
-        )
+        return err_code in self.get_ignored_codes(line_number)
+
+    def get_ignored_codes(self, line_number: int) -> frozenset[str]:
+        try:
+            return self._ignored_codes[line_number]
+        except KeyError:
+            codes = ignored_error_codes(
+                self._parsed_file.get_line(line_number)
+            )
+            self._ignored_codes[line_number] = codes
+            return codes
 
 
 class TrytonMetadata:
@@ -108,7 +162,38 @@ class TrytonMetadata:
         )
 
 
-class PythonAnalyzer(Analyzer, cst.CSTVisitor):
+VisitorFunction = Callable[[Any, cst.CSTNode], Any]
+
+
+class LeafSkippingVisitor(cst.CSTVisitor):
+    """
+    A CSTVisitor which does not descend into the children of leaf nodes
+    """
+
+    # Node types whose children (parentheses, whitespace, comments) never
+    # hold anything worth visiting
+    skipped_children_types: frozenset[type] = frozenset(
+        {
+            cst.Name,
+            cst.SimpleString,
+            cst.Integer,
+            cst.Float,
+            cst.Imaginary,
+            cst.Ellipsis,
+            cst.EmptyLine,
+            cst.TrailingWhitespace,
+            cst.ParenthesizedWhitespace,
+        }
+    )
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        return (
+            super().on_visit(node)
+            and type(node) not in self.skipped_children_types
+        )
+
+
+class PythonAnalyzer(Analyzer, LeafSkippingVisitor):
     METADATA_DEPENDENCIES = (PositionProvider,)
     _parsed: cst.CSTNode
 
@@ -117,31 +202,62 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
     ) -> None:
         super().__init__(parsed, pool_manager)
         self._import_path = parsed.get_import_path()
-        self._metadata: dict[cst.ClassDef, TrytonMetadata | None] = {}
+        self._node_cache = parsed.get_node_cache()
         self._positions: dict[CodeRange, cst.CSTNode] = {}
+        # Position metadata of all nodes, resolved once per analysis rather
+        # than going through get_metadata on every visited node
+        self._positions_map: Mapping[cst.CSTNode, CodeRange] = {}
         self._cur_class: cst.ClassDef | None = None
         self._cur_function: cst.FunctionDef | None = None
-        self._class_for_function: dict[
-            cst.FunctionDef, cst.ClassDef | None
-        ] = {}
         self._class_metadata: TrytonMetadata | None = None
+        # Class / metadata of the enclosing classes, restored when leaving a
+        # (nested) class definition
+        self._class_stack: list[
+            tuple[cst.ClassDef | None, TrytonMetadata | None]
+        ] = []
 
         # Variables which are instances of Pool
         # Typical use case will be "pool = Pool()"
         self._function_pool_vars: set[str] = set()
 
         # Variables identified as a given model
-        self._node_mappings: dict[cst.CSTNode | str, "PoolModel"] = {}
+        self._name_mappings: dict[str, "PoolModel"] = {}
 
         # List of variables identified as a given model
-        self._node_list_mappings: dict[cst.CSTNode | str, "PoolModel"] = {}
+        self._name_list_mappings: dict[str, "PoolModel"] = {}
+
+        # Same as above for expressions, keyed by node id (nodes are alive as
+        # long as the parsed file) to avoid going through CSTNode.__hash__
+        self._node_mappings: dict[int, "PoolModel"] = {}
+        self._node_list_mappings: dict[int, "PoolModel"] = {}
 
         # Ranges to limit the parsing to, used to interrupt search when looking
         # for completions
         self._ranges: list[CodeRange] = []
+        # Start positions of the ranges (sorted), and the furthest end
+        # position of all ranges up to each of them, to check overlaps
+        # without iterating on all ranges
+        self._range_starts: list[tuple[int, int]] = []
+        self._range_max_ends: list[tuple[int, int]] = []
+
+    def _set_ranges(self, ranges: list[CodeRange]) -> None:
+        self._ranges = ranges
+        self._range_starts = []
+        self._range_max_ends = []
+        for start, end in sorted(
+            (
+                (x.start.line, x.start.column),
+                (x.end.line, x.end.column),
+            )
+            for x in ranges
+        ):
+            self._range_starts.append(start)
+            if self._range_max_ends:
+                end = max(end, self._range_max_ends[-1])
+            self._range_max_ends.append(end)
 
     def _track_position(self, node: cst.CSTNode) -> None:
-        self._positions[self.get_metadata(PositionProvider, node)] = node
+        self._positions[self._positions_map[node]] = node
 
     def _must_analyze(self, node: cst.CSTNode) -> bool:
         """
@@ -150,28 +266,20 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         """
         if not self._ranges:
             return True
-        metadata = self.get_metadata(PositionProvider, node)
-
-        def check_range(range: CodeRange) -> bool:
-            if range.end.line < metadata.start.line:
-                return False
-            if (
-                range.end.line == metadata.start.line
-                and range.end.column < metadata.start.column
-            ):
-                return False
-            if range.start.line > metadata.end.line:
-                return False
-            if (
-                range.start.line == metadata.end.line
-                and range.start.column > metadata.end.column
-            ):
-                return False
-            return True
-
-        return any(check_range(x) for x in self._ranges)
+        metadata = self._positions_map[node]
+        # Only the ranges starting before the end of the node may overlap it,
+        # one of them must end after its start
+        candidates = bisect_right(
+            self._range_starts, (metadata.end.line, metadata.end.column)
+        )
+        return bool(candidates) and self._range_max_ends[candidates - 1] >= (
+            metadata.start.line,
+            metadata.start.column,
+        )
 
     def visit_ClassDef(self, node: cst.ClassDef) -> bool:
+        # leave_ClassDef is called even when the class is not analyzed
+        self._class_stack.append((self._cur_class, self._class_metadata))
         if not self._must_analyze(node):
             return False
         self._track_position(node)
@@ -179,7 +287,7 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         # The __name__ = '...' line
         model_node = self._model_name(node)
         if model_node and self._module:
-            model_name = model_node.value[1:-1]
+            model_name = sys.intern(string_value(model_node))
             class_name = node.name.value
             import_info = self._module.get_module_list_for_import(
                 self._filename, class_name
@@ -224,26 +332,21 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
             )
         else:
             self._class_metadata = None
-        self._metadata[node] = self._class_metadata
         return True
 
     def leave_ClassDef(self, node: cst.ClassDef) -> None:
-        # Reset the current model
-        self._cur_class = None
-        self._class_metadata = None
+        # Get back to the enclosing class' model, if any
+        self._cur_class, self._class_metadata = self._class_stack.pop()
 
     def visit_FunctionDef(self, node: cst.FunctionDef) -> bool:
         if not self._must_analyze(node):
             return False
         self._track_position(node)
         self._cur_function = node
-        self._class_for_function[node] = self._cur_class
         # Reset known names
-        self._node_list_mappings.clear()
-        self._node_mappings.clear()
-        self._function_pool_vars.clear()
+        self._reset_function_names()
         if self._class_metadata and self._class_metadata._model:
-            self._node_mappings = {
+            self._name_mappings = {
                 "self": self._class_metadata._model,
                 "cls": self._class_metadata._model,
             }
@@ -289,7 +392,8 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         """
         self._check_parameters(node)
         self._check_super_call(node)
-        self._check_depends(node)
+        if node.decorators:
+            self._check_depends(node)
 
     def _check_parameters(self, node: cst.FunctionDef) -> None:
         """
@@ -299,75 +403,71 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         pool = self.get_pool()
         if not pool:
             return
-        for match in m.extractall(
-            node.params,
-            # Matches arguments annotated with:
-            #   - Record: current model
-            #   - Records: list of current model
-            m.Param(
-                name=m.SaveMatchedNode(m.Name(), "param_name"),
-                annotation=m.Annotation(
-                    annotation=m.SaveMatchedNode(
-                        m.Name(value="Record") | m.Name(value="Records"),
-                        "annotation_name",
-                    )
-                ),
-            )
-            # Matches arguments annotated with:
-            #   - Record["some_model"]: instance of Pool().get("some_model")
-            #   - Records["some_model"]: list of instances of
-            #       Pool().get("some_model")
-            | m.Param(
-                name=m.SaveMatchedNode(m.Name(), "param_name"),
-                annotation=m.Annotation(
-                    annotation=m.Subscript(
-                        value=m.SaveMatchedNode(
-                            m.Name(value="Record") | m.Name(value="Records"),
-                            "annotation_name",
-                        ),
-                        slice=[
-                            m.SubscriptElement(
-                                slice=m.Index(
-                                    value=m.SaveMatchedNode(
-                                        m.SimpleString(), "model_name"
-                                    )
-                                )
-                            )
-                        ],
-                    )
-                ),
-            ),
+        params = node.params
+        for param in (
+            *params.posonly_params,
+            *params.params,
+            params.star_arg,
+            *params.kwonly_params,
+            params.star_kwarg,
         ):
-            model: PoolModel | None = None
-            if "model_name" in match:
-                model_name: cst.Name = cast(cst.Name, match["model_name"])
-                try:
-                    model = pool.get(
-                        model_name.value[1:-1],
-                        cast("PoolKind", "model"),
-                    )
-                except KeyError:
-                    self.add_diagnostic(
-                        UnknownModel.init_from_analyzer(
-                            self,
-                            model_name,
-                            unknown_name=model_name.value[1:-1],
-                        )
-                    )
-            elif self._class_metadata is not None:
-                model = self._class_metadata._model
-            else:
-                model = None
-            if model is None:
+            if not isinstance(param, cst.Param):
                 continue
-            annotation_name: cst.Name = cast(
-                cst.Name, match["annotation_name"]
-            )
-            param_name: cst.Name = cast(cst.Name, match["param_name"])
-            if annotation_name.value == "Record":
-                self._node_mappings[param_name.value] = model
+            target = self._get_annotation_model(pool, param.annotation)
+            if target is None:
+                continue
+            model, is_list = target
+            if is_list:
+                self._name_list_mappings[param.name.value] = model
             else:
-                self._node_list_mappings[param_name.value] = model
+                self._name_mappings[param.name.value] = model
+
+    def _get_annotation_model(
+        self, pool: "Pool", annotation: cst.Annotation | None
+    ) -> tuple["PoolModel", bool] | None:
+        """
+        Returns the model an annotation refers to, and whether it is a list of
+        records of this model:
+            - Record: current model
+            - Records: list of current model
+            - Record["some_model"]: instance of Pool().get("some_model")
+            - Records["some_model"]: list of instances of
+                Pool().get("some_model")
+        """
+        if annotation is None:
+            return None
+        annotation_node = annotation.annotation
+        model_name: cst.SimpleString | None = None
+        if isinstance(annotation_node, cst.Subscript):
+            if len(annotation_node.slice) != 1:
+                return None
+            index = annotation_node.slice[0].slice
+            if not isinstance(index, cst.Index) or not isinstance(
+                index.value, cst.SimpleString
+            ):
+                return None
+            model_name = index.value
+            annotation_node = annotation_node.value
+        if not isinstance(annotation_node, cst.Name) or (
+            annotation_node.value not in ("Record", "Records")
+        ):
+            return None
+        model: PoolModel | None = None
+        if model_name is not None:
+            model_name_value = sys.intern(string_value(model_name))
+            try:
+                model = pool.get(model_name_value, cast("PoolKind", "model"))
+            except KeyError:
+                self.add_diagnostic(
+                    UnknownModel.init_from_analyzer(
+                        self, model_name, unknown_name=model_name_value
+                    )
+                )
+        elif self._class_metadata is not None:
+            model = self._class_metadata._model
+        if model is None:
+            return None
+        return model, annotation_node.value == "Records"
 
     def _check_depends(self, node: cst.FunctionDef) -> None:
         """
@@ -382,94 +482,55 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
 
         for decorator in node.decorators:
             # Only work on the @fields.depends decorator
-            if not m.matches(
-                decorator,
-                m.Decorator(
-                    decorator=m.Call(
-                        func=m.Attribute(
-                            value=m.Name(value="fields"),
-                            attr=m.Name(value="depends"),
-                        )
-                    )
-                ),
-            ):
+            if not m.matches(decorator, DEPENDS_DECORATOR_MATCHER):
                 continue
             # Iterate on all parameters of the decorator
             for arg in cast(cst.Call, decorator.decorator).args:
-                if m.matches(arg, m.Arg(value=m.SimpleString(), keyword=None)):
+                if m.matches(arg, DEPENDS_ARG_STRING_MATCHER):
                     # Basic case: we expect the name of a field, or maybe
                     # _parent_xxxx.yyyy fields
-                    cur_model = model
-                    field_names = (
+                    parents, _, field_name = string_value(
                         cast(cst.SimpleString, arg.value)
-                        .value[1:-1]
-                        .split(".")
-                    )
-                    for field_name in field_names[:-1]:
-                        # Parse everything before the dot
-                        if not field_name.startswith("_parent_"):
-                            # TODO: dedicated diagnostic
-                            self.add_diagnostic(
-                                UnknownAttribute.init_from_analyzer(
-                                    self,
-                                    arg.value,
-                                    model_name=cur_model.name,
-                                    attr_name=field_name,
-                                )
-                            )
-                            break
-                        # Remove the "_parent_" part
-                        field_name = field_name[8:]
-                        if field_name not in cur_model.fields:
-                            self.add_diagnostic(
-                                UnknownAttribute.init_from_analyzer(
-                                    self,
-                                    arg.value,
-                                    model_name=cur_model.name,
-                                    attr_name=field_name,
-                                )
-                            )
-                            break
-                        field = cur_model.fields[field_name]
-                        if field["type"] != "many2one":
-                            # TODO: dedicated diagnostic
-                            self.add_diagnostic(
-                                UnknownAttribute.init_from_analyzer(
-                                    self,
-                                    arg.value,
-                                    model_name=cur_model.name,
-                                    attr_name=field_name,
-                                )
-                            )
-                            break
-                        try:
-                            # Change the current model, and go to the next
-                            # "dot" (or the final part) of the depends
-                            cur_model = pool.get(
-                                field["relation"], cast("PoolKind", "model")
-                            )
-                        except KeyError:
+                    ).rpartition(".")
+                    cur_model = model
+                    if parents:
+                        (
+                            cur_model,
+                            unknown_attr,
+                            unknown_relation,
+                        ) = pool.resolve_depends_parents(model, parents)
+                        if unknown_relation:
                             self.add_diagnostic(
                                 UnknownModel.init_from_analyzer(
                                     self,
                                     arg.value,
-                                    unknown_name=field["relation"],
+                                    unknown_name=unknown_relation,
                                 )
                             )
-                            break
-                    else:
-                        # Actual field name we need to check
-                        field_name = field_names[-1]
-                        if field_name not in cur_model.fields:
+                            continue
+                        if unknown_attr:
+                            # TODO: dedicated diagnostic when not a many2one /
+                            # not a _parent_ prefix
                             self.add_diagnostic(
                                 UnknownAttribute.init_from_analyzer(
                                     self,
                                     arg.value,
                                     model_name=cur_model.name,
-                                    attr_name=field_name,
+                                    attr_name=unknown_attr,
                                 )
                             )
-                elif m.matches(arg, m.Arg(value=m.List(), keyword=m.Name())):
+                            continue
+                    # Actual field name we need to check
+                    if field_name not in cur_model.fields:
+                        self.add_diagnostic(
+                            UnknownAttribute.init_from_analyzer(
+                                self,
+                                arg.value,
+                                model_name=cur_model.name,
+                                attr_name=field_name,
+                            )
+                        )
+                elif m.matches(arg, DEPENDS_ARG_METHODS_MATCHER):
                     # Case of @fields.depends(methods=[...])
                     if cast(cst.Name, arg.keyword).value != "methods":
                         # TODO: dedicated diagnostic
@@ -483,13 +544,11 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
                         )
                         continue
                     for method in cast(cst.List, arg.value).elements:
-                        if not m.matches(
-                            method, m.Element(value=m.SimpleString())
-                        ):
+                        if not m.matches(method, STRING_ELEMENT_MATCHER):
                             continue
-                        method_name = cast(
-                            cst.SimpleString, method.value
-                        ).value[1:-1]
+                        method_name = string_value(
+                            cast(cst.SimpleString, method.value)
+                        )
                         # For method, we just check that it exists on the model
                         if not model.has_attribute(method_name):
                             self.add_diagnostic(
@@ -506,22 +565,8 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         We want to make sure that an overriden method actually calls super (and
         a few other things)"""
         # Find all calls to super in the function's body
-        super_call = m.extractall(
-            node,
-            m.Call(
-                func=m.Attribute(
-                    value=m.SaveMatchedNode(
-                        m.Call(func=m.Name(value="super")), "super_invocation"
-                    ),
-                    attr=m.SaveMatchedNode(m.Name(), "super_name"),
-                )
-            ),
-        )
-        for cur_call in super_call:
-            super_invocation: cst.Call = cast(
-                cst.Call, cur_call["super_invocation"]
-            )
-            super_name: cst.Name = cast(cst.Name, cur_call["super_name"])
+        super_call = self._find_super_calls(node)
+        for super_invocation, super_name in super_call:
             if super_invocation.args:
                 # Detect if super(Move, self) is used rather than plain super()
                 # TODO: Add a way to disable this, it's mostly style
@@ -550,112 +595,139 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         # made where no super exists), so we must interact with Tryton through
         # the companion to get some informations
         has_super = bool(super_call)
-        found_base, found_super = False, False
         function_name = self.get_current_function_name()
-        # We iterate over the mro, returning only classes that define /
-        # override the current function
-        #   - klass_str contains the qualified name of the class for matching
-        #       (trytond.modules.account_invoice.invoice.Invoice)
+        current_class = (self._import_path, self.get_current_class_name())
+        # The mro, with for each class whether it defines / overrides the
+        # current function:
+        #   - klass_module / klass_name identify the class for matching
+        #       (trytond.modules.account_invoice.invoice / Invoice)
         #   - details contains the filepath / line number of the parent
         #       function declaration
-        for klass_str, details in model.get_super_information(function_name):
-            if self.get_import_path() in klass_str:
-                found_base = True
-            elif found_base and not has_super and details:
-                if details == "no_code":
-                    # TODO: properties do not have code ?
-                    break
-                parent_file_name, first_line_no = details
-                parent_parsed = self._pool_manager.get_parsed(
-                    Path(parent_file_name)
-                )
-                if parent_parsed is None:
-                    # TODO: Error
-                    break
-                # We use a specialized parser to quicly find the current parent
-                # function for parsing
-                wrapper = cst.MetadataWrapper(
-                    parent_parsed.get_parsed(), unsafe_skip_copy=True
-                )
-                finder = FunctionFinder(lineno=first_line_no)
-                wrapper.visit(finder)
-                if finder._match and not ignore_error_code(
-                    finder._match, MissingSuperCall.err_code
-                ):
-                    # The current function has a parent, but super is not
-                    # called, that's an error
-                    self.add_diagnostic(
-                        MissingSuperCall.init_from_analyzer(self, node.name)
-                    )
+        mro = model.get_super_information(function_name)
+        for base_index, (klass_module, klass_name, _) in enumerate(mro):
+            if (klass_module, klass_name) == current_class:
                 break
-            elif (
-                found_base
-                and has_super
-                and not found_super
-                and details is not None
-            ):
-                found_super = True
-        if has_super and not found_super:
-            # The current function has a super call, but we could not
-            # find a parent definition => Error
+        else:
+            base_index = len(mro)
+        # Definitions of the function in the parents of the current class
+        parents = (
+            details
+            for klass_module, klass_name, details in mro[base_index + 1 :]
+            if (klass_module, klass_name) != current_class
+        )
+        if has_super:
+            if not any(details is not None for details in parents):
+                # The current function has a super call, but we could not
+                # find a parent definition => Error
+                self.add_diagnostic(
+                    SuperWithoutParent.init_from_analyzer(self, node.name)
+                )
+            return
+        details = next((x for x in parents if x), None)
+        if not details or details == "no_code":
+            # TODO: properties do not have code ?
+            return
+        parent_file_name, first_line_no = details
+        parent_ignored_codes = self._pool_manager.get_function_ignored_codes(
+            Path(parent_file_name), first_line_no
+        )
+        if (
+            parent_ignored_codes is not None
+            and MissingSuperCall.err_code not in parent_ignored_codes
+        ):
+            # The current function has a parent, but super is not called,
+            # that's an error
             self.add_diagnostic(
-                SuperWithoutParent.init_from_analyzer(self, node.name)
+                MissingSuperCall.init_from_analyzer(self, node.name)
             )
 
     def leave_FunctionDef(self, node: cst.FunctionDef) -> None:
         # Reset everything
         self._cur_function = None
-        self._node_mappings.clear()
-        self._node_list_mappings.clear()
-        self._function_pool_vars.clear()
+        self._reset_function_names()
+
+    def _reset_function_names(self) -> None:
+        # Allocating new (mostly empty) containers is cheaper than clearing
+        # the populated ones
+        self._name_mappings = {}
+        self._name_list_mappings = {}
+        self._node_mappings = {}
+        self._node_list_mappings = {}
+        self._function_pool_vars = set()
+
+    def _find_super_calls(
+        self, node: cst.FunctionDef
+    ) -> list[tuple[cst.Call, cst.Name]]:
+        """
+        All the super().xxx calls in the function, computed once per parsed
+        function
+        """
+        key = ("super_calls", id(node))
+        try:
+            return self._node_cache[key]
+        except KeyError:
+            pass
+        calls: list[tuple[cst.Call, cst.Name]] = []
+        # Most functions do not call super, do not walk them if their source
+        # does not even contain it
+        position = self._positions_map[node]
+        if "super" in self._parsed_file.get_lines(
+            position.start.line, position.end.line
+        ):
+            finder = SuperCallFinder()
+            node.visit(finder)
+            calls = finder._calls
+        self._node_cache[key] = calls
+        return calls
 
     def _model_name(self, node: cst.ClassDef) -> cst.SimpleString | None:
         """
         Search for the __name__ of the class
         """
-        extract_data = m.extractall(
-            node,
-            m.Assign(
-                targets=[m.AssignTarget(target=m.Name(value="__name__"))],
-                value=m.SaveMatchedNode(m.SimpleString(), "__name__"),
-            ),
-        )
-        if not extract_data:
+        name_definitions = self._scan_model_names(node)
+        if not name_definitions:
             return None
-        match, *extra_matches = extract_data
-        if "__name__" in match:
-            name_definition: cst.SimpleString = cast(
-                cst.SimpleString, match["__name__"]
-            )
-            for extra in extra_matches:
-                # More than one '__name__ = "..."' in the body of the class
-                if "__name__" in extra:
-                    extra_match: cst.SimpleString = cast(
-                        cst.SimpleString, extra["__name__"]
+        name_definition, *extra_matches = name_definitions
+        for extra_match in extra_matches:
+            # More than one '__name__ = "..."' in the body of the class
+            if name_definition.value == extra_match.value:
+                self.add_diagnostic(
+                    DuplicateName(
+                        self.get_node_position(extra_match),
+                        self._filepath,
+                        self.get_module_name(),
+                        string_value(name_definition),
+                        node.name.value,
                     )
-                    if name_definition.value == extra_match.value:
-                        self.add_diagnostic(
-                            DuplicateName(
-                                self.get_node_position(extra_match),
-                                self._filepath,
-                                self.get_module_name(),
-                                name_definition.value[1:-1],
-                                node.name.value,
-                            )
-                        )
-                    else:
-                        self.add_diagnostic(
-                            ConflictingName(
-                                self.get_node_position(extra_match),
-                                self._filepath,
-                                self.get_module_name(),
-                                name_definition.value[1:-1],
-                                node.name.value,
-                            )
-                        )
+                )
+            else:
+                self.add_diagnostic(
+                    ConflictingName(
+                        self.get_node_position(extra_match),
+                        self._filepath,
+                        self.get_module_name(),
+                        string_value(name_definition),
+                        node.name.value,
+                    )
+                )
+        return name_definition
 
-            return name_definition
-        return None
+    def _scan_model_names(self, node: cst.ClassDef) -> list[cst.SimpleString]:
+        """
+        All the '__name__ = "..."' values in the class, computed once per
+        parsed class
+        """
+        key = ("model_names", id(node))
+        try:
+            return self._node_cache[key]
+        except KeyError:
+            pass
+        name_definitions = [
+            cast(cst.SimpleString, match["__name__"])
+            for match in m.extractall(node, MODEL_NAME_ASSIGN_MATCHER)
+        ]
+        self._node_cache[key] = name_definitions
+        return name_definitions
 
     def leave_Attribute(self, node: cst.Attribute) -> None:
         """
@@ -682,26 +754,14 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         pool = self.get_pool()
         if not pool:
             return
-        if model.type == "model":
-            if (
-                attr not in model.fields
-                or "relation" not in model.fields[attr]
-            ):
-                # We can only "go further" if the "y" is a field with a
-                # relation
-                return
-            field = model.fields[attr]
-            target = pool.get(field["relation"])
-            if field["type"] == "many2one":
-                self._node_mappings[node] = target
-            else:
-                self._node_list_mappings[node] = target
-        elif model.type == "wizard":
-            if attr not in model.states:
-                return
-            self._node_mappings[node] = pool.get(
-                model.states[attr]["relation"]
-            )
+        target = pool.get_attribute_target(model, attr)
+        if target is None:
+            return
+        target_model, is_list = target
+        if is_list:
+            self._node_list_mappings[id(node)] = target_model
+        else:
+            self._node_mappings[id(node)] = target_model
 
     def visit_Call(self, node: cst.Call) -> None:
         """
@@ -713,33 +773,16 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         value_type = self._get_type(node.func)
         if value_type is not None:
             # instantiation
-            self._node_mappings[node] = value_type
+            self._node_mappings[id(node)] = value_type
             return
-        extracted = m.extract(
-            node,
-            m.Call(
-                func=m.Attribute(
-                    value=m.SaveMatchedNode(
-                        m.MatchIfTrue(lambda x: x in self._node_mappings),
-                        "match",
-                    )
-                    | m.Name(
-                        value=m.SaveMatchedNode(
-                            m.MatchIfTrue(lambda x: x in self._node_mappings),
-                            "match",
-                        )
-                    ),
-                    attr=m.Name(),
-                )
-            ),
-        )
-        if extracted:
-            value_type = extracted["match"]
-            func_name = cast(cst.Attribute, node.func).attr.value
-            if func_name in ("search", "browse"):
-                self._node_list_mappings[node] = self._node_mappings[
-                    value_type
-                ]
+        func = node.func
+        if not isinstance(func, cst.Attribute):
+            return
+        value_type = self._node_mappings.get(id(func.value))
+        if value_type is None and isinstance(func.value, cst.Name):
+            value_type = self._name_mappings.get(func.value.value)
+        if value_type is not None and func.attr.value in ("search", "browse"):
+            self._node_list_mappings[id(node)] = value_type
 
     def visit_For(self, node: cst.For) -> None:
         """
@@ -747,10 +790,12 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         unambiguous
         """
         node.iter.visit(self)
+        if not isinstance(node.target, cst.Name):
+            return
         base_type = self._get_list_type(node.iter)
         if base_type is None:
             return
-        self._node_mappings[cast(cst.Name, node.target).value] = base_type
+        self._name_mappings[node.target.value] = base_type
 
     def visit_ListComp(self, node: cst.ListComp) -> None:
         node.for_in.visit(self)
@@ -762,168 +807,124 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         self._analyze_comp(node)
 
     def leave_CompFor(self, node: cst.CompFor) -> None:
-        if not m.matches(node.target, m.Name()):
+        if not isinstance(node.target, cst.Name):
             return
         base_type = self._get_list_type(node.iter)
         if base_type is None:
             return
-        self._node_mappings[cast(cst.Name, node.target).value] = base_type
+        self._name_mappings[node.target.value] = base_type
 
     def _analyze_comp(self, node: cst.BaseSimpleComp) -> None:
         base_type = self._get_type(node.elt)
         if base_type is None:
             return
-        self._node_list_mappings[node] = base_type
+        self._node_list_mappings[id(node)] = base_type
 
     def visit_AnnAssign(self, node: cst.AnnAssign) -> None:
         pool = self.get_pool()
         if not pool:
             return
-        match = m.extract(
-            node.annotation,
-            m.Annotation(
-                annotation=m.SaveMatchedNode(
-                    m.Name(value="Record") | m.Name(value="Records"),
-                    "annotation_name",
-                )
-            )
-            | m.Annotation(
-                annotation=m.Subscript(
-                    value=m.SaveMatchedNode(
-                        m.Name(value="Record") | m.Name(value="Records"),
-                        "annotation_name",
-                    ),
-                    slice=[
-                        m.SubscriptElement(
-                            slice=m.Index(
-                                value=m.SaveMatchedNode(
-                                    m.SimpleString(), "model_name"
-                                )
-                            )
-                        )
-                    ],
-                )
-            ),
-        )
-        if not match:
+        target = self._get_annotation_model(pool, node.annotation)
+        if target is None:
             return
-        model: PoolModel | None = None
-        if "model_name" in match:
-            model_name: cst.Name = cast(cst.Name, match["model_name"])
-            try:
-                model = pool.get(
-                    model_name.value[1:-1],
-                    cast("PoolKind", "model"),
-                )
-            except KeyError:
-                self.add_diagnostic(
-                    UnknownModel.init_from_analyzer(
-                        self,
-                        model_name,
-                        unknown_name=model_name.value[1:-1],
-                    )
-                )
-        elif self._class_metadata is not None:
-            model = self._class_metadata._model
+        model, is_list = target
+        if is_list:
+            self._node_list_mappings[id(node)] = model
         else:
-            model = None
-        if model is None:
-            return
-        annotation_name: cst.Name = cast(cst.Name, match["annotation_name"])
-        if annotation_name.value == "Record":
-            self._node_mappings[node] = model
-        else:
-            self._node_list_mappings[node] = model
+            self._node_mappings[id(node)] = model
 
     def leave_AnnAssign(self, node: cst.AnnAssign) -> None:
-        if not m.matches(node.target, m.Name()):
+        if not isinstance(node.target, cst.Name):
             return
-        target = cast(cst.Name, node.target).value
+        target = node.target.value
 
         value_type = self._get_type(cast(cst.CSTNode, node.value))
         if (
             value_type
-            and node in self._node_mappings
-            and value_type != self._node_mappings[node]
+            and id(node) in self._node_mappings
+            and value_type != self._node_mappings[id(node)]
         ):
             self.add_diagnostic(
                 ChangeVariableModel.init_from_analyzer(
                     self,
                     node.target,
-                    previous_model=self._node_mappings[node].name,
+                    previous_model=self._node_mappings[id(node)].name,
                     new_model=value_type.name,
                 )
             )
-        if value_type or node in self._node_mappings:
-            self._node_mappings[target] = (
-                value_type or self._node_mappings[node]
+        if value_type or id(node) in self._node_mappings:
+            self._name_mappings[target] = (
+                value_type or self._node_mappings[id(node)]
             )
             return
 
         value_type = self._get_list_type(cast(cst.CSTNode, node.value))
         if (
             value_type
-            and node in self._node_list_mappings
-            and value_type != self._node_list_mappings[node]
+            and id(node) in self._node_list_mappings
+            and value_type != self._node_list_mappings[id(node)]
         ):
             self.add_diagnostic(
                 ChangeVariableModel.init_from_analyzer(
                     self,
                     node.target,
-                    previous_model=self._node_mappings[node].name,
+                    previous_model=self._node_list_mappings[id(node)].name,
                     new_model=value_type.name,
                 )
             )
-        if value_type or node in self._node_list_mappings:
-            self._node_list_mappings[target] = (
-                value_type or self._node_list_mappings[node]
+        if value_type or id(node) in self._node_list_mappings:
+            self._name_list_mappings[target] = (
+                value_type or self._node_list_mappings[id(node)]
             )
             return
 
-        self._node_mappings.pop(target, None)
-        self._node_list_mappings.pop(target, None)
+        self._name_mappings.pop(target, None)
+        self._name_list_mappings.pop(target, None)
 
     def leave_Assign(self, node: cst.Assign) -> None:
         """
         Set type to a variable based on the expression we assign to it
         """
-        # If the node is a "Pool().get", nothing to do
-        if self._check_is_pool(node):
+        value_kind = type(node.value)
+        # If the node is a "pool = Pool()", nothing to do
+        if value_kind is cst.Call and self._check_is_pool(node):
             return
 
-        mono, multi = None, []
-        if m.matches(
-            node.targets[0],
-            m.AssignTarget(
-                target=m.Tuple(
-                    elements=[
-                        m.AtLeastN(n=1, matcher=m.Element(value=m.Name()))
-                    ]
-                )
-            ),
-        ):
-            target: cst.Tuple = cast(cst.Tuple, node.targets[0].target)
-            multi = [
-                cast(cst.Name, name.value).value
-                for name in target.elements
-                if m.matches(name, m.Element(value=m.Name()))
-            ]
-        elif m.matches(node.targets[0].target, m.Name()):
-            mono = cast(cst.Name, node.targets[0].target).value
+        mono: str | None = None
+        multi: list[str] = []
+        target = node.targets[0].target
+        if isinstance(target, cst.Name):
+            mono = target.value
+        elif isinstance(target, cst.Tuple) and target.elements:
+            # a, b, c = ...
+            for element in target.elements:
+                if not isinstance(element, cst.Element) or not isinstance(
+                    element.value, cst.Name
+                ):
+                    return
+                multi.append(element.value.value)
         else:
             return
 
+        if value_kind not in TYPED_EXPRESSION_TYPES:
+            # Literals, operations... are never records, the targets only
+            # lose their previous type
+            for name in multi + ([mono] if mono else []):
+                self._name_mappings.pop(name, None)
+                self._name_list_mappings.pop(name, None)
+            return
+
         # If the assigned value is a single record
         value_type = self._get_type(node.value)
         if value_type is not None:
             if mono:
                 # If we assign to a single value, we can set its model
-                self._node_mappings[mono] = value_type
+                self._name_mappings[mono] = value_type
             for name in multi:
                 # If me assign to mulitple records, we clear them
                 # TODO: Error?
-                self._node_mappings.pop(name, None)
-                self._node_list_mappings.pop(name, None)
+                self._name_mappings.pop(name, None)
+                self._name_list_mappings.pop(name, None)
             return
 
         # If the assigned value is a list of records
@@ -931,33 +932,31 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         if value_type is not None:
             if mono:
                 # If we assign to a single value, it is a list of records
-                self._node_list_mappings[mono] = value_type
+                self._name_list_mappings[mono] = value_type
             elif multi:
                 for name in multi:
-                    self._node_mappings[name] = value_type
+                    self._name_mappings[name] = value_type
             else:
                 for name in multi + ([mono] if mono else []):
-                    self._node_mappings.pop(name, None)
-                    self._node_list_mappings.pop(name, None)
+                    self._name_mappings.pop(name, None)
+                    self._name_list_mappings.pop(name, None)
             return
 
         # If we do not know the type, reset everything
         for name in multi + ([mono] if mono else []):
-            self._node_mappings.pop(name, None)
-            self._node_list_mappings.pop(name, None)
+            self._name_mappings.pop(name, None)
+            self._name_list_mappings.pop(name, None)
 
     def leave_Subscript(self, node: cst.Subscript) -> None:
         """
         Assign types when using my_list[X] or my_list[X:Y]
         """
-        if m.matches(
-            node,
-            m.Subscript(slice=[m.SubscriptElement(slice=m.Index())])
-            | m.Subscript(slice=[m.SubscriptElement(slice=m.Slice())]),
-        ):
+        # Index and Slice are the only possible slices, so my_list[X] /
+        # my_list[X:Y] are all the subscripts with a single element
+        if len(node.slice) == 1:
             value_type = self._get_list_type(node.value)
             if value_type is not None:
-                self._node_mappings[node] = value_type
+                self._node_mappings[id(node)] = value_type
                 return
 
     def visit_Lambda(self, node: cst.Lambda) -> bool:
@@ -969,100 +968,83 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         """
         We know the type of a node through the node mappings
         """
-        if isinstance(node, cst.Name) and node.value in self._node_mappings:
-            return self._node_mappings[node.value]
-        if node in self._node_mappings:
-            return self._node_mappings[node]
-        model = self._handle_pool_get(node)
+        # Single lookups (mapped values are never None), Name has no subclass
+        if type(node) is cst.Name:
+            model = self._name_mappings.get(node.value)
+            if model is not None:
+                return model
+        model = self._node_mappings.get(id(node))
         if model is not None:
             return model
+        return self._handle_pool_get(node)
 
     def _get_list_type(self, node: cst.CSTNode) -> Any:
-        if (
-            isinstance(node, cst.Name)
-            and node.value in self._node_list_mappings
-        ):
-            return self._node_list_mappings[node.value]
-        if node in self._node_list_mappings:
-            return self._node_list_mappings[node]
+        if type(node) is cst.Name:
+            model = self._name_list_mappings.get(node.value)
+            if model is not None:
+                return model
+        return self._node_list_mappings.get(id(node))
 
     def _handle_pool_get(self, node: cst.CSTNode) -> Any:
+        # Check if the node is a "Pool().get(...)" / "pool.get(...)" call to
+        # identify the record type. This is tried on most expressions, so it
+        # is checked by hand rather than through a matcher
+        if type(node) is not cst.Call or not 1 <= len(node.args) <= 2:
+            return None
+        func = node.func
+        if type(func) is not cst.Attribute or func.attr.value != "get":
+            return None
+        target = func.value
+        if type(target) is cst.Call:
+            if (
+                type(target.func) is not cst.Name
+                or target.func.value != "Pool"
+            ):
+                return None
+        elif (
+            type(target) is not cst.Name
+            or target.value not in self._function_pool_vars
+        ):
+            return None
+        model_name = node.args[0].value
+        if type(model_name) is not cst.SimpleString:
+            return None
+        extracted_kind: cst.SimpleString | None = None
+        if len(node.args) == 2:
+            kind_arg = node.args[1].value
+            if type(kind_arg) is not cst.SimpleString:
+                return None
+            extracted_kind = kind_arg
         pool = self.get_pool()
         if not pool:
             return None
-        # Check if the node matches "Pool().get(...)" to identify the record
-        # type
-        extracted = m.extract(
-            node,
-            m.Call(
-                func=m.Attribute(
-                    value=m.OneOf(
-                        m.Call(func=m.Name(value="Pool")),
-                        m.Name(
-                            value=m.MatchIfTrue(
-                                lambda value: value in self._function_pool_vars
-                            )
-                        ),
-                    ),
-                    attr=m.Name(value="get"),
-                ),
-                args=[
-                    m.Arg(
-                        value=m.SaveMatchedNode(m.SimpleString(), "model_name")
-                    ),
-                    m.AtMostN(
-                        n=1,
-                        matcher=m.Arg(
-                            value=m.SaveMatchedNode(m.SimpleString(), "kind")
-                        ),
-                    ),
-                ],
-            ),
-        )
-        if extracted is not None and "model_name" in extracted:
-            model_name: cst.SimpleString = cast(
-                cst.SimpleString, extracted["model_name"]
-            )
-            extracted_kind: cst.SimpleString | None = None
-            kind = "model"
-            if "kind" in extracted:
-                extracted_kind = cast(cst.SimpleString, extracted["kind"])
-                kind = extracted_kind.value[1:-1]
-                if kind not in pool.supported_keys:
-                    # TODO: Remove?
-                    self.add_diagnostic(
-                        UnknownPoolKey.init_from_analyzer(
-                            self,
-                            extracted_kind,
-                            possible_values=", ".join(pool.supported_keys),
-                        )
-                    )
-            try:
-                self._node_mappings[node] = pool.get(
-                    model_name.value[1:-1], cast("PoolKind", kind)
-                )
-                return self._node_mappings[node]
-            except KeyError:
+        kind = "model"
+        if extracted_kind is not None:
+            kind = sys.intern(string_value(extracted_kind))
+            if kind not in pool.supported_keys:
+                # TODO: Remove?
                 self.add_diagnostic(
-                    UnknownModel.init_from_analyzer(
+                    UnknownPoolKey.init_from_analyzer(
                         self,
-                        model_name,
-                        unknown_name=model_name.value[1:-1],
+                        extracted_kind,
+                        possible_values=", ".join(pool.supported_keys),
                     )
                 )
+        model_name_value = sys.intern(string_value(model_name))
+        try:
+            self._node_mappings[id(node)] = pool.get(
+                model_name_value, cast("PoolKind", kind)
+            )
+            return self._node_mappings[id(node)]
+        except KeyError:
+            self.add_diagnostic(
+                UnknownModel.init_from_analyzer(
+                    self, model_name, unknown_name=model_name_value
+                )
+            )
 
     def _check_is_pool(self, node: cst.Assign) -> bool:
-        is_pool = m.extract(
-            node,
-            m.Assign(
-                targets=[
-                    m.AssignTarget(
-                        target=m.SaveMatchedNode(m.Name(), "var_name")
-                    )
-                ],
-                value=m.Call(func=m.Name(value="Pool")),
-            ),
-        )
+        is_pool = m.extract(node, POOL_ASSIGN_MATCHER)
         if is_pool is not None and "var_name" in is_pool:
             var_name: cst.Name = cast(cst.Name, is_pool["var_name"])
             self._function_pool_vars.add(var_name.value)
@@ -1081,7 +1063,7 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         return self._class_metadata._class_name if self._class_metadata else ""
 
     def get_node_position(self, node: cst.CSTNode) -> CodeRange:
-        return self.get_metadata(PositionProvider, node)
+        return self._positions_map[node]
 
     def get_current_function_name(self) -> str:
         return self._cur_function.name.value if self._cur_function else ""
@@ -1090,20 +1072,23 @@ class PythonAnalyzer(Analyzer, cst.CSTVisitor):
         self, ranges: list[CodeRange] | None = None
     ) -> list[Diagnostic]:
         self._diagnostics = []
-        self._ranges = ranges or []
+        self._set_ranges(ranges or [])
         wrapper = cst.MetadataWrapper(
             cast(cst.Module, self._parsed), unsafe_skip_copy=True
         )
+        self._positions_map = wrapper.resolve(PositionProvider)
         wrapper.visit(self)
         return self._diagnostics
 
     def ignored(self, err_code: str, line_number: int) -> bool:
-        # Allow to set ignore commentaries above the bad line
+        # Allow to set ignore commentaries above the bad line (the codes of
+        # a line are cached, so they are checked before its contents)
         return super().ignored(err_code, line_number) or (
             line_number > 1
-            and self._raw_lines[line_number - 2].lstrip().startswith("#")
-            and f"IGNORE-TRYTON-LS-{err_code}"
-            in self._raw_lines[line_number - 2]
+            and err_code in self.get_ignored_codes(line_number - 1)
+            and self._parsed_file.get_line(line_number - 1)
+            .lstrip()
+            .startswith("#")
         )
 
 
@@ -1123,12 +1108,12 @@ class PythonCompletioner(PythonAnalyzer):
 
     def _must_analyze(self, node: cst.CSTNode) -> bool:
         # Only analyze the class / function containing the position to complete
-        metadata = self.get_metadata(PositionProvider, node)
+        metadata = self._positions_map[node]
         result = metadata.start.line <= self._line <= metadata.end.line
         return result
 
     def visit_Attribute(self, node: cst.Attribute) -> None:
-        metadata = self.get_metadata(PositionProvider, node)
+        metadata = self._positions_map[node]
         if metadata.start.line == self._line == metadata.end.line and (
             metadata.start.column <= self._column <= metadata.end.column
         ):
@@ -1146,28 +1131,124 @@ class PythonCompletioner(PythonAnalyzer):
         raise CompletionTargetFoundError
 
 
-class FunctionFinder(cst.CSTVisitor):
+class FunctionFinder(LeafSkippingVisitor):
     """
-    Very basic Visitor class to find a node by its position
+    Very basic Visitor class to index the (module / class level) functions of
+    a file, so that they can then be found by position
     """
 
     METADATA_DEPENDENCIES = (PositionProvider,)
 
-    def __init__(self, lineno: int) -> None:
+    def __init__(self) -> None:
         super().__init__()
-        self._lineno = lineno
-        self._match: cst.FunctionDef | None = None
-
-    def visit_ClassDef(self, node: cst.ClassDef) -> bool:
-        position = self.get_metadata(PositionProvider, node)
-        return position.start.line <= self._lineno <= position.end.line
+        # Functions do not overlap since we do not look into them, so they are
+        # sorted by start line
+        self._starts: list[int] = []
+        self._functions: list[tuple[int, cst.FunctionDef]] = []
+        # keys: id of the function node
+        # values: error codes ignored in the function's comments
+        self._ignored_codes: dict[int, frozenset[str]] = {}
 
     def visit_FunctionDef(self, node: cst.FunctionDef) -> bool:
         position = self.get_metadata(PositionProvider, node)
-        if position.start.line <= self._lineno <= position.end.line:
-            self._match = node
+        self._starts.append(position.start.line)
+        self._functions.append((position.end.line, node))
         return False
 
+    def find(self, lineno: int) -> cst.FunctionDef | None:
+        index = bisect_right(self._starts, lineno) - 1
+        if index < 0:
+            return None
+        end, node = self._functions[index]
+        return node if lineno <= end else None
+
+    def get_ignored_codes(self, node: cst.FunctionDef) -> frozenset[str]:
+        """
+        The error codes ignored in an indexed function, collected once
+        """
+        try:
+            return self._ignored_codes[id(node)]
+        except KeyError:
+            pass
+        result = self._ignored_codes[id(node)] = node_ignored_error_codes(node)
+        return result
+
+
+class SuperCallFinder(LeafSkippingVisitor):
+    """
+    Very basic Visitor class to find super().xxx calls
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # The super() call / the name of the called method
+        self._calls: list[tuple[cst.Call, cst.Name]] = []
+
+    def visit_Call(self, node: cst.Call) -> None:
+        func = node.func
+        if (
+            isinstance(func, cst.Attribute)
+            and isinstance(func.value, cst.Call)
+            and isinstance(func.value.func, cst.Name)
+            and func.value.func.value == "super"
+        ):
+            self._calls.append((func.value, func.attr))
+
+
+# Expected nesting level of the tags of tryton xml files
+XML_TAG_DEPTHS = {"data": 2, "record": 3, "field": 4}
+
+# keys: path of a tryton.cfg file
+# values: mtime / size of the file, its stripped lines
+TRYTON_CFG_LINES: dict[Path, tuple[int, int, frozenset[str]]] = {}
+
+
+def tryton_cfg_lines(path: Path) -> frozenset[str]:
+    """
+    The (stripped) lines of a tryton.cfg file, read again only when it is
+    modified
+    """
+    stat = path.stat()
+    cached = TRYTON_CFG_LINES.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    lines = frozenset(x.strip() for x in path.read_text().splitlines())
+    TRYTON_CFG_LINES[path] = (stat.st_mtime_ns, stat.st_size, lines)
+    return lines
+
+
+ELEMENT_HANDLERS: dict[tuple[type, str], dict[str, VisitorFunction]] = {}
+
+
+def element_handlers(klass: type, event: str) -> dict[str, VisitorFunction]:
+    """
+    The `_analyze_<tag>_<event>` methods of a xml analyzer class, by tag
+    """
+    try:
+        return ELEMENT_HANDLERS[klass, event]
+    except KeyError:
+        pass
+    prefix, suffix = "_analyze_", f"_{event}"
+    handlers = ELEMENT_HANDLERS[klass, event] = {
+        name[len(prefix) : -len(suffix)]: getattr(klass, name)
+        for name in dir(klass)
+        if name.startswith(prefix) and name.endswith(suffix)
+    }
+    return handlers
+
+
+def release_element(element: etree.Element) -> None:
+    """
+    Free an element (and its previous siblings) once it was analyzed, so that
+    iterating on a xml file only keeps the current branch in memory
+    """
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is None:
+        return
+    while element.getprevious() is not None:
+        del parent[0]
+
 
 class XMLAnalyzer(Analyzer):
     def __init__(
@@ -1177,10 +1258,13 @@ class XMLAnalyzer(Analyzer):
         self._ranges: list[CodeRange] = []
         self._fs_ids: dict[str, int] = {}
         self._found_tryton_tag = False
-        self._tag_stack: list[etree.Element] = []
+        # Nesting level of the current element
+        self._depth = 0
         self._current_pool: Optional["Pool"] = None
         self._current_model: Any = None
         self._cur_prefix: int = 0
+        self._start_handlers = element_handlers(type(self), "start")
+        self._end_handlers = element_handlers(type(self), "end")
 
     def analyze(
         self, ranges: list[CodeRange] | None = None
@@ -1196,6 +1280,7 @@ class XMLAnalyzer(Analyzer):
                     self.analyze_node_start(element)
                 elif action == "end":
                     self.analyze_node_end(element)
+                    release_element(element)
         except etree.XMLSyntaxError:
             pass
 
@@ -1208,37 +1293,41 @@ class XMLAnalyzer(Analyzer):
         return self._diagnostics
 
     def analyze_node_start(self, element: etree.Element) -> None:
-        self._tag_stack.append(element)
-        if element.text and element.text.startswith("\n"):
-            self._cur_prefix = len(element.text) - 1
-        analyze_func = getattr(self, f"_analyze_{element.tag}_start", None)
+        self._depth += 1
+        # lxml builds a new string on each access to .text
+        text = element.text
+        if text and text[0] == "\n":
+            self._cur_prefix = len(text) - 1
+        analyze_func = self._start_handlers.get(element.tag)
         if analyze_func is None:
             return
-        analyze_func(element)
-
-    def analyze_node_end(self, element: etree.Element) -> None:
-        analyze_func = getattr(self, f"_analyze_{element.tag}_end", None)
-        if analyze_func:
-            analyze_func(element)
-        self._tag_stack.pop(-1)
-
-    def _analyze_tryton_start(self, node: etree.Element) -> None:
-        self._found_tryton_tag = True
-
-    def _analyze_data_start(self, node: etree.Element) -> None:
-        if len(self._tag_stack) != 2:
-            # We found a <data> node, but not at the second level, so the file
-            # does not seem to follow the expected format:
+        expected_depth = XML_TAG_DEPTHS.get(element.tag)
+        if expected_depth is not None and self._depth != expected_depth:
+            # The file does not seem to follow the expected format:
             # <tryton>
             #   <data>
-            #       ...
+            #       <record>
+            #           <field/>
+            #       </record>
             #   </data>
             # </tryton>
             self.add_diagnostic(
                 UnexpectedXMLTag.init_from_analyzer(
-                    self, node, tag_name=node.tag
+                    self, element, tag_name=element.tag
                 )
             )
+        analyze_func(self, element)
+
+    def analyze_node_end(self, element: etree.Element) -> None:
+        analyze_func = self._end_handlers.get(element.tag)
+        if analyze_func:
+            analyze_func(self, element)
+        self._depth -= 1
+
+    def _analyze_tryton_start(self, node: etree.Element) -> None:
+        self._found_tryton_tag = True
+
+    def _analyze_data_start(self, node: etree.Element) -> None:
         if not self._module:
             return
         modules = [self._module.get_name()]
@@ -1252,12 +1341,6 @@ class XMLAnalyzer(Analyzer):
         """
         Analyses <record> entries for errors
         """
-        if len(self._tag_stack) != 3:
-            self.add_diagnostic(
-                UnexpectedXMLTag.init_from_analyzer(
-                    self, node, tag_name=node.tag
-                )
-            )
         if "model" not in node.attrib:
             # We expect <record model=...
             self.add_diagnostic(
@@ -1303,12 +1386,6 @@ class XMLAnalyzer(Analyzer):
         """
         Analyses <field> tags
         """
-        if len(self._tag_stack) != 4:
-            self.add_diagnostic(
-                UnexpectedXMLTag.init_from_analyzer(
-                    self, node, tag_name=node.tag
-                )
-            )
         if "name" not in node.attrib:
             # We expect <field name=
             self.add_diagnostic(
@@ -1356,11 +1433,9 @@ class XMLAnalyzer(Analyzer):
         """
         Returns whether a xml file is registered in the current tryton module
         """
-        with open(self._module_path / "tryton.cfg") as f:
-            for line in f.readlines():
-                if f"{self._filename}.xml" == line.strip():
-                    return True
-        return False
+        return f"{self._filename}.xml" in tryton_cfg_lines(
+            self._module_path / "tryton.cfg"
+        )
 
     def get_node_position(self, node: etree.Element) -> CodeRange:
         return CodeRange(
@@ -1369,12 +1444,14 @@ class XMLAnalyzer(Analyzer):
         )
 
     def ignored(self, err_code: str, line_number: int) -> bool:
-        # Allow to set ignore commentaries above the bad line
+        # Allow to set ignore commentaries above the bad line (the codes of
+        # a line are cached, so they are checked before its contents)
         return super().ignored(err_code, line_number) or (
             line_number > 1
-            and self._raw_lines[line_number - 2].lstrip().startswith("<!--")
-            and f"IGNORE-TRYTON-LS-{err_code}"
-            in self._raw_lines[line_number - 2]
+            and err_code in self.get_ignored_codes(line_number - 1)
+            and self._parsed_file.get_line(line_number - 1)
+            .lstrip()
+            .startswith("<!--")
         )
 
 
@@ -1391,6 +1468,8 @@ class ViewAnalyzer(Analyzer):
         modules, view_type, view_model = view_info
         self._current_model = pool_manager.get_pool(modules).get(view_model)
         self._view_type = view_type
+        self._start_handlers = element_handlers(type(self), "start")
+        self._end_handlers = element_handlers(type(self), "end")
 
     def analyze(
         self, ranges: list[CodeRange] | None = None
@@ -1403,22 +1482,25 @@ class ViewAnalyzer(Analyzer):
                     self.analyze_node_start(element)
                 elif action == "end":
                     self.analyze_node_end(element)
+                    release_element(element)
         except etree.XMLSyntaxError:
             pass
         return self._diagnostics
 
     def analyze_node_start(self, element: etree.Element) -> None:
-        if element.text and element.text.startswith("\n"):
-            self._cur_prefix = len(element.text) - 1
-        analyze_func = getattr(self, f"_analyze_{element.tag}_start", None)
+        # lxml builds a new string on each access to .text
+        text = element.text
+        if text and text[0] == "\n":
+            self._cur_prefix = len(text) - 1
+        analyze_func = self._start_handlers.get(element.tag)
         if analyze_func is None:
             return
-        analyze_func(element)
+        analyze_func(self, element)
 
     def analyze_node_end(self, element: etree.Element) -> None:
-        analyze_func = getattr(self, f"_analyze_{element.tag}_end", None)
+        analyze_func = self._end_handlers.get(element.tag)
         if analyze_func:
-            analyze_func(element)
+            analyze_func(self, element)
 
     def _analyze_form_start(self, node: etree.Element) -> None:
         if self._view_type not in ("list-form", "form"):
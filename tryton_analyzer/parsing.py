@@ -12,6 +12,36 @@ if TYPE_CHECKING:
     from .analyzer import Analyzer
     from .pool import Module, PoolManager
 
+# keys: directory
+# values: the closest directory (itself or one of its parents) holding a
+# tryton.cfg file, if any
+ModuleRoots = dict[Path, Path | None]
+
+
+def find_module_root(
+    directory: Path, cache: ModuleRoots | None = None
+) -> Path | None:
+    """
+    The root of the tryton module containing `directory`. If a cache is
+    provided, results are stored in it for all directories walked through,
+    so that files of the same module only look for the tryton.cfg file once
+    """
+    if cache is None:
+        cache = {}
+    walked = []
+    root: Path | None = None
+    for path in (directory, *directory.parents):
+        if path in cache:
+            root = cache[path]
+            break
+        walked.append(path)
+        if (path / "tryton.cfg").is_file():
+            root = path
+            break
+    for path in walked:
+        cache[path] = root
+    return root
+
 
 class ParsingError(Exception):
     def __init__(self, path: Path):
@@ -30,30 +60,32 @@ class ModuleNotFoundError(ParsingError):
 
 
 class ParsedFile:
-    def __init__(self, path: Path, data: str | None = None):
+    def __init__(
+        self,
+        path: Path,
+        data: str | None = None,
+        module_roots: ModuleRoots | None = None,
+    ):
         super().__init__()
         self._path: Path = path
 
-        self._module_path: Path | None = self._find_module_path()
+        self._module_path: Path | None = find_module_root(
+            path.parent, module_roots
+        )
         self._module_name: str = (
             self._module_path.stem if self._module_path else ""
         )
         self._module: Module | None = None
         if not data:
-            with open(path) as f:
-                data = f.read()
+            data = path.read_text()
         self._raw_data: str = data
-        self._raw_lines: list[str] = data.splitlines()
+        # Encoded data, for parsers working on bytes
+        self._raw_bytes: bytes | None = None
+        # Offsets of the start of each line in the raw data, computed on first
+        # access rather than splitting the whole file in lines
+        self._line_offsets: list[int] | None = None
         self._parse(data)
 
-    def _find_module_path(self) -> Path | None:
-        names = [self._path.stem]
-        for path in self._path.parents:
-            names.append(path.stem)
-            if (path / "tryton.cfg").is_file():
-                return path
-        return None
-
     def _parse(self, data: str) -> None:
         raise ParsingSyntaxError(self._path)
 
@@ -71,6 +103,14 @@ class ParsedFile:
     def get_path(self) -> Path:
         return self._path
 
+    def get_raw_data(self) -> str:
+        return self._raw_data
+
+    def get_raw_bytes(self) -> bytes:
+        if self._raw_bytes is None:
+            self._raw_bytes = self._raw_data.encode("UTF-8")
+        return self._raw_bytes
+
     def set_module(self, module: Module | None) -> None:
         self._module = module
 
@@ -83,15 +123,46 @@ class ParsedFile:
     def get_parsed(self) -> Any:
         raise NotImplementedError
 
-    def get_raw_lines(self) -> list[str]:
-        return self._raw_lines
+    def _get_line_offsets(self) -> list[int]:
+        if self._line_offsets is None:
+            data = self._raw_data
+            offsets = [0]
+            position = data.find("\n")
+            while position != -1:
+                offsets.append(position + 1)
+                position = data.find("\n", position + 1)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def get_lines(self, start: int, end: int) -> str:
+        """
+        The raw text from line `start` to line `end` (both included, starting
+        from 1)
+        """
+        offsets = self._get_line_offsets()
+        if not 1 <= start <= len(offsets):
+            raise IndexError(start)
+        if end < len(offsets):
+            return self._raw_data[offsets[start - 1] : offsets[end] - 1]
+        return self._raw_data[offsets[start - 1] :]
+
+    def get_line(self, line_number: int) -> str:
+        """
+        The raw text of a line (starting from 1), without its line ending
+        """
+        return self.get_lines(line_number, line_number).rstrip("\r")
 
 
 class ParsedXMLFile(ParsedFile):
     _parsed: etree.iterparse
 
-    def __init__(self, path: Path, data: str | None = None):
-        super().__init__(path, data)
+    def __init__(
+        self,
+        path: Path,
+        data: str | None = None,
+        module_roots: ModuleRoots | None = None,
+    ):
+        super().__init__(path, data, module_roots)
 
     def _parse(self, data: str) -> None:
         # We want a lazy iteration, so we rely on "get_parsed" to get an
@@ -100,8 +171,8 @@ class ParsedXMLFile(ParsedFile):
 
     def get_parsed(self) -> etree.iterparse:
         return etree.iterparse(
-            BytesIO(self._raw_data.encode("UTF-8")),
-            events=["start", "comment", "end"],
+            BytesIO(self.get_raw_bytes()),
+            events=("start", "end"),
         )
 
     def get_analyzer(self, pool_manager: PoolManager) -> Analyzer:
@@ -113,8 +184,13 @@ class ParsedXMLFile(ParsedFile):
 class ParsedViewFile(ParsedFile):
     _parsed: etree.iterparse
 
-    def __init__(self, path: Path, data: str | None = None):
-        super().__init__(path, data)
+    def __init__(
+        self,
+        path: Path,
+        data: str | None = None,
+        module_roots: ModuleRoots | None = None,
+    ):
+        super().__init__(path, data, module_roots)
 
     def _parse(self, data: str) -> None:
         # We want a lazy iteration, so we rely on "get_parsed" to get an
@@ -123,8 +199,8 @@ class ParsedViewFile(ParsedFile):
 
     def get_parsed(self) -> etree.iterparse:
         return etree.iterparse(
-            BytesIO(self._raw_data.encode("UTF-8")),
-            events=["start", "comment", "end"],
+            BytesIO(self.get_raw_bytes()),
+            events=("start", "end"),
         )
 
     def get_analyzer(self, pool_manager: PoolManager) -> Analyzer:
@@ -136,15 +212,26 @@ class ParsedViewFile(ParsedFile):
 class ParsedPythonFile(ParsedFile):
     _parsed: CSTNode
 
-    def __init__(self, path: Path, data: str | None = None):
-        super().__init__(path, data)
+    def __init__(
+        self,
+        path: Path,
+        data: str | None = None,
+        module_roots: ModuleRoots | None = None,
+    ):
+        super().__init__(path, data, module_roots)
         self._import_path: str | None = self._find_import_path()
+        # Results of analysis steps which only depend on the parsed tree,
+        # shared between all the analyzers of this file. Keys are the step
+        # name and the id of the node, which is alive as long as this file is
+        self._node_cache: dict[tuple[str, int], Any] = {}
 
     def _find_import_path(self) -> str | None:
+        if self._module_path is None:
+            return None
         names = [self._path.stem]
         for path in self._path.parents:
             names.append(path.stem)
-            if (path / "tryton.cfg").is_file():
+            if path == self._module_path:
                 return "trytond.modules." + ".".join(reversed(names))
         return None
 
@@ -162,6 +249,9 @@ class ParsedPythonFile(ParsedFile):
     def get_parsed(self) -> CSTNode:
         return self._parsed
 
+    def get_node_cache(self) -> dict[tuple[str, int], Any]:
+        return self._node_cache
+
     def get_analyzer(self, pool_manager: PoolManager) -> Analyzer:
         from .analyzer import PythonAnalyzer
 
@@ -3,18 +3,25 @@ from __future__ import annotations
 import ast
 import importlib
 import os
-from collections.abc import Generator
+import re
+import sys
+from collections.abc import Generator, Iterable
 from enum import StrEnum
-from io import BytesIO
 from pathlib import Path
 from typing import Any, cast
 
+import libcst as cst
 from libcst.metadata import CodeRange
 from lsprotocol.types import CompletionItem, CompletionItemKind
 from lxml import etree
 
-from .analyzer import CompletionTargetFoundError, PythonCompletioner
+from .analyzer import (
+    CompletionTargetFoundError,
+    FunctionFinder,
+    PythonCompletioner,
+)
 from .parsing import (
+    ModuleRoots,
     ParsedFile,
     ParsedPythonFile,
     ParsedViewFile,
@@ -28,6 +35,8 @@ Dependencies = tuple[str, ...]
 ModuleName = str
 ModelName = str
 
+PARENT_SEGMENT = re.compile(r"_parent_(\w+)")
+
 
 class PoolKind(StrEnum):
     MODEL = "model"
@@ -44,6 +53,17 @@ class PoolManager:
         self._parsed: dict[Path, ParsedFile | None] = {}
         self._modules: dict[ModuleName, Module] = {}
         self._pools: dict[Dependencies, Pool] = {}
+        # Equal dependencies share the same tuple, to make lookups on them
+        # identity based
+        self._dependencies: dict[Dependencies, Dependencies] = {}
+        # Module roots of the directories holding the parsed files, dropped
+        # with the pool manager (e.g. when the language server resets it)
+        self._module_roots: ModuleRoots = {}
+        # keys: path of a python file read from the disk
+        # values: mtime / size of the file, index of its functions
+        self._function_finders: dict[Path, tuple[int, int, FunctionFinder]] = (
+            {}
+        )
         self._companion: Companion = Companion()
 
     def close(self) -> None:
@@ -70,7 +90,7 @@ class PoolManager:
         Returns a proxy to the tryton pool for the requested dependencies,
         which can later be requested for informations
         """
-        key = tuple(sorted(module_names))
+        key = self.get_dependencies(module_names)
         if key in self._pools:
             return self._pools[key]
 
@@ -80,6 +100,13 @@ class PoolManager:
         self._pools[key] = pool
         return self._pools[key]
 
+    def get_dependencies(self, module_names: Iterable[str]) -> Dependencies:
+        """
+        Returns the sorted dependencies for a set of module names
+        """
+        key = tuple(sorted(sys.intern(x) for x in module_names))
+        return self._dependencies.setdefault(key, key)
+
     def fetch_model(
         self, key: Dependencies, name: ModelName, kind: PoolKind
     ) -> dict:
@@ -145,57 +172,121 @@ class PoolManager:
         """
         parsed = self.get_parsed(path, data=data)
         if parsed and isinstance(parsed, ParsedPythonFile):
-            return self._get_completions(parsed, line, column)
+            return self.generate_parsed_completions(parsed, line, column)
         return []
 
+    def generate_parsed_completions(
+        self, parsed: ParsedPythonFile, line: int, column: int
+    ) -> list[CompletionItem]:
+        """
+        Find completions for the provided position in an already parsed file,
+        so that multiple positions can be queried without parsing it again
+        """
+        return self._get_completions(parsed, line, column)
+
     def get_parsed(
         self, path: Path, data: str | None = None
     ) -> ParsedFile | None:
         """
         Returns a parsed file from the provided path / data, selecting the
         appropriate parser.
+
+        The last parsed file of a path is reused as long as its contents do
+        not change
         """
         parser_class: type[ParsedFile] | None = self._parser_from_path(path)
         if parser_class is None:
             return None
         can_fallback = data is not None
         if not can_fallback:
-            with open(path) as f:
-                data = f.read()
+            data = path.read_text()
 
-        parsed: ParsedFile | None = None
-        try:
-            parsed = parser_class(path, data=data)
-        except ParsingError:
-            if path in self._parsed:
-                # Reuse the previously parsed informations
-                parsed = self._parsed[path]
-            if parsed is None and can_fallback:
-                # If the provided data cannot be parsed, try to parse the
-                # underlying file, even though it may be incomplete
-                try:
-                    parsed = parser_class(path)
-                except ParsingError:
-                    parsed = None
-            else:
-                parsed = None
+        parsed: ParsedFile | None = self._parsed.get(path)
+        if parsed is None or parsed.get_raw_data() != data:
+            parsed = self._parse(parser_class, path, data, can_fallback)
 
         if parsed is not None:
             module_name: ModuleName | None = parsed.get_module_name()
             if module_name:
                 parsed.set_module(self._get_module(module_name))
-        self._parsed[path] = parsed
+            self._parsed[path] = parsed
         return parsed
 
+    def _parse(
+        self,
+        parser_class: type[ParsedFile],
+        path: Path,
+        data: str | None,
+        can_fallback: bool,
+    ) -> ParsedFile | None:
+        try:
+            return parser_class(
+                path, data=data, module_roots=self._module_roots
+            )
+        except ParsingError:
+            pass
+        # Reuse the last successfully parsed version of the file rather than
+        # parsing anything else
+        previous = self._parsed.get(path)
+        if previous is not None or not can_fallback:
+            return previous
+        # If the provided data cannot be parsed, try to parse the underlying
+        # file, even though it may be incomplete
+        try:
+            return parser_class(path, module_roots=self._module_roots)
+        except ParsingError:
+            return None
+
+    def get_function_ignored_codes(
+        self, path: Path, lineno: int
+    ) -> frozenset[str] | None:
+        """
+        Returns the error codes ignored in the function defined at lineno in
+        the python file at path, or None if there is no such function
+        """
+        finder = self._get_function_finder(path)
+        if finder is None:
+            return None
+        function = finder.find(lineno)
+        if function is None:
+            return None
+        return finder.get_ignored_codes(function)
+
+    def _get_function_finder(self, path: Path) -> FunctionFinder | None:
+        """
+        The index of the functions of a python file, which is built once until
+        the file is modified
+        """
+        if self._parser_from_path(path) is not ParsedPythonFile:
+            return None
+        stat = os.stat(path)
+        cached = self._function_finders.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        parsed = self.get_parsed(path)
+        if not isinstance(parsed, ParsedPythonFile):
+            return None
+        finder = FunctionFinder()
+        cst.MetadataWrapper(
+            cast(cst.Module, parsed.get_parsed()), unsafe_skip_copy=True
+        ).visit(finder)
+        self._function_finders[path] = (
+            stat.st_mtime_ns,
+            stat.st_size,
+            finder,
+        )
+        return finder
+
     def _parser_from_path(self, path: Path) -> type[ParsedFile] | None:
         """
         Selects the right parser based on the path
         """
-        if path.match("*.py"):
+        suffix = path.suffix
+        if suffix == ".py":
             return ParsedPythonFile
-        elif path.match("view/*.xml"):
-            return ParsedViewFile
-        elif path.match("*.xml"):
+        elif suffix == ".xml":
+            if path.parent.name == "view":
+                return ParsedViewFile
             return ParsedXMLFile
         else:
             return None
@@ -223,29 +314,37 @@ class PoolManager:
 
     def generate_module_diagnostics(
         self, module_name: ModuleName
-    ) -> list[Diagnostic]:
+    ) -> Generator[Diagnostic, None, None]:
         """
-        Shortcut to get diagnostics for all files of a module
+        Shortcut to get diagnostics for all files of a module. Diagnostics are
+        yielded file by file as they are computed
         """
         module = self._get_module(module_name)
         module_path = module.get_directory()
-        diagnostics = []
 
         def to_analyze() -> Generator[Path, None, None]:
-            for file_path in os.listdir(module_path):
-                yield Path(file_path)
-            if os.path.isdir(module_path / "tests"):
-                for file_path in os.listdir(module_path / "tests"):
-                    yield Path("tests") / file_path
-            if os.path.isdir(module_path / "view"):
-                for file_path in os.listdir(module_path / "view"):
-                    if file_path.endswith(".xml"):
-                        yield Path("view") / file_path
+            # Only python and xml files can be analyzed, other entries are
+            # filtered out while scanning the directories
+            sub_directories = set()
+            with os.scandir(module_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        sub_directories.add(entry.name)
+                    elif entry.name.endswith((".py", ".xml")):
+                        yield Path(entry.path)
+            for sub_directory, suffixes in (
+                ("tests", (".py", ".xml")),
+                ("view", (".xml",)),
+            ):
+                if sub_directory not in sub_directories:
+                    continue
+                with os.scandir(module_path / sub_directory) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(suffixes) and entry.is_file():
+                            yield Path(entry.path)
 
         for file_path in to_analyze():
-            diagnostics += self.generate_diagnostics(module_path / file_path)
-
-        return diagnostics
+            yield from self.generate_diagnostics(file_path)
 
 
 class Pool:
@@ -256,7 +355,7 @@ class Pool:
     to request model informations
     """
 
-    supported_keys = {"model", "wizard"}
+    supported_keys = frozenset(("model", "wizard"))
 
     def __init__(
         self,
@@ -268,12 +367,24 @@ class Pool:
         super().__init__()
         self._key: Dependencies = key
         self._manager: PoolManager = manager
+        # Names are received from the companion process, so they are interned
+        # to make the many lookups on them identity based
         self.models: dict[ModelName, PoolModel | None] = {
-            x: None for x in models
+            sys.intern(x): None for x in models
         }
         self.wizards: dict[ModelName, PoolModel | None] = {
-            x: None for x in wizards
+            sys.intern(x): None for x in wizards
         }
+        # keys: model kind / model name / attribute name
+        # values: target model / whether the attribute is a list
+        self._attribute_targets: dict[
+            tuple[PoolKind, ModelName, str], tuple[PoolModel, bool] | None
+        ] = {}
+        # keys: model name / parents path of a depends ("_parent_a._parent_b")
+        # values: see resolve_depends_parents
+        self._depends_parents: dict[
+            tuple[ModelName, str], tuple[PoolModel, str, str]
+        ] = {}
 
     def get(
         self, name: ModelName, kind: PoolKind = PoolKind.MODEL
@@ -282,15 +393,91 @@ class Pool:
         Get a PoolModel proxy for a given name / type (as Tryton's Pool().get(...))
         """
         referential = self.models if kind == PoolKind.MODEL else self.wizards
-        if name not in referential:
-            raise UnknownModelException
-        if referential[name] is not None:
-            return cast(PoolModel, referential[name])
-        result = self._manager.fetch_model(self._key, name, kind)
-        model = PoolModel(name, kind, result, self)
-        referential[name] = model
+        try:
+            model = referential[name]
+        except KeyError:
+            raise UnknownModelException(name)
+        if model is None:
+            result = self._manager.fetch_model(self._key, name, kind)
+            model = referential[name] = PoolModel(name, kind, result, self)
         return model
 
+    def get_attribute_target(
+        self, model: PoolModel, attr: str
+    ) -> tuple[PoolModel, bool] | None:
+        """
+        Get the model targeted by the `attr` attribute of `model` (for
+        relation fields / wizard states), and whether it is a list of records
+        """
+        key = (model.type, model.name, attr)
+        try:
+            return self._attribute_targets[key]
+        except KeyError:
+            pass
+        target: tuple[PoolModel, bool] | None = None
+        if model.type == "model":
+            # We can only "go further" if the attribute is a field with a
+            # relation
+            field = model.fields.get(attr)
+            if field is not None and "relation" in field:
+                target = (
+                    self.get(field["relation"]),
+                    field["type"] != "many2one",
+                )
+        elif model.type == "wizard":
+            if attr in model.states:
+                target = (self.get(model.states[attr]["relation"]), False)
+        self._attribute_targets[key] = target
+        return target
+
+    def resolve_depends_parents(
+        self, model: PoolModel, parents: str
+    ) -> tuple[PoolModel, str, str]:
+        """
+        Follow the "_parent_xxx" chain of a depends (as in @fields.depends)
+        starting from `model`.
+
+        Returns:
+            - The last model that could be reached
+            - The attribute name that could not be followed on this model, if
+              any
+            - The unknown relation name of this attribute, if any
+        """
+        key = (model.name, parents)
+        try:
+            return self._depends_parents[key]
+        except KeyError:
+            pass
+        # Resolve the path one hop at a time, so that the prefix it shares with
+        # other depends ("_parent_a._parent_b" / "_parent_a._parent_c") is
+        # only followed once
+        head, _, segment = parents.rpartition(".")
+        if head:
+            result = self.resolve_depends_parents(model, head)
+            cur_model, unknown_attr, _ = result
+        else:
+            cur_model, unknown_attr = model, ""
+        if not unknown_attr:
+            match = PARENT_SEGMENT.fullmatch(segment)
+            if match is None:
+                result = (cur_model, segment, "")
+            else:
+                field_name = match.group(1)
+                field = cur_model.fields.get(field_name)
+                if field is None or field["type"] != "many2one":
+                    result = (cur_model, field_name, "")
+                else:
+                    try:
+                        result = (
+                            self.get(field["relation"], PoolKind.MODEL),
+                            "",
+                            "",
+                        )
+                    except KeyError:
+                        result = (cur_model, field_name, field["relation"])
+        self._depends_parents[key] = result
+        return result
+
     def fetch_super_information(
         self, model: PoolModel, function_name: str
     ) -> Any:
@@ -305,23 +492,55 @@ class Pool:
 
 
 class PoolModel:
+    __slots__ = (
+        "_pool",
+        "type",
+        "name",
+        "_dir",
+        "fields",
+        "states",
+        "_completion_cache",
+        "_completion_items",
+        "_super_information",
+    )
+
     def __init__(
         self, name: ModelName, type: PoolKind, data: dict[str, Any], pool: Pool
     ) -> None:
         super().__init__()
         self._pool: Pool = pool
         self.type: PoolKind = type
-        self.name: ModelName = name
-        self._dir: set[str] = data["attrs"]
-        self.fields: dict[str, Any] = data.get("fields", {})
-        self.states: dict[str, Any] = data.get("states", {})
+        self.name: ModelName = sys.intern(name)
+        # Attributes of the model, except its fields
+        self._dir: frozenset[str] = frozenset(
+            sys.intern(x) for x in data["attrs"]
+        )
+        self.fields: dict[str, Any] = {
+            sys.intern(k): v for k, v in data.get("fields", {}).items()
+        }
+        self.states: dict[str, Any] = {
+            sys.intern(k): v for k, v in data.get("states", {}).items()
+        }
         self._completion_cache: dict[str, dict[str, Any]] | None = None
+        self._completion_items: list[CompletionItem] | None = None
+        # keys: function name
+        # values: the classes of the MRO and details about their definition
+        # of the function, see pool_companion._get_super_calls
+        self._super_information: dict[str, list[Any]] = {}
 
-    def get_super_information(self, function_name: str) -> Any:
-        return self._pool.fetch_super_information(self, function_name)
+    def get_super_information(self, function_name: str) -> list[Any]:
+        try:
+            return self._super_information[function_name]
+        except KeyError:
+            pass
+        result = self._super_information[function_name] = (
+            self._pool.fetch_super_information(self, function_name)
+        )
+        return result
 
     def has_attribute(self, name: str) -> bool:
-        return name in self._dir
+        # Fields are not part of the other attributes
+        return name in self._dir or name in self.fields
 
     def get_completions(self) -> dict[str, dict[str, Any]]:
         if self._completion_cache is not None:
@@ -330,24 +549,33 @@ class PoolModel:
         return self._completion_cache
 
     def generate_completions(self) -> list[CompletionItem]:
-        completions = []
+        if self._completion_items is None:
+            self._completion_items = self._generate_completions()
+        return list(self._completion_items)
+
+    def _generate_completions(self) -> list[CompletionItem]:
+        # Fields are proposed before methods
+        field_items: list[CompletionItem] = []
+        other_items: list[CompletionItem] = []
         for key, info in self.get_completions().items():
-            documentation = ""
             if info["type"] == "field":
-                documentation += info["string"]
+                parts = [info["string"]]
                 if info.get("function", False):
-                    documentation += " [Function]"
-                if info.get("selection", None):
-                    selection = ", ".join(x[0] for x in info["selection"])
-                    documentation += "\n\nSelection:\n\n"
-                    documentation += selection
-                if info.get("domain", None):
-                    documentation += "\n\nDomain:\n\n"
-                    documentation += info["domain"]
-                if info.get("states", None):
-                    documentation += "\n\nStates: \n\n"
-                    documentation += info["states"]
-                completions.append(
+                    parts.append(" [Function]")
+                selection = info.get("selection", None)
+                if selection:
+                    parts.append("\n\nSelection:\n\n")
+                    parts.append(", ".join(x[0] for x in selection))
+                domain = info.get("domain", None)
+                if domain:
+                    parts.append("\n\nDomain:\n\n")
+                    parts.append(domain)
+                states = info.get("states", None)
+                if states:
+                    parts.append("\n\nStates: \n\n")
+                    parts.append(states)
+                documentation = "".join(parts)
+                field_items.append(
                     CompletionItem(
                         label=key,
                         kind=CompletionItemKind.Field,
@@ -356,7 +584,7 @@ class PoolModel:
                     )
                 )
             elif info["type"] == "state":
-                completions.append(
+                field_items.append(
                     CompletionItem(
                         label=key,
                         kind=CompletionItemKind.Field,
@@ -364,17 +592,14 @@ class PoolModel:
                     )
                 )
             elif info["type"] == "method":
-                completions.append(
+                other_items.append(
                     CompletionItem(
                         label=key,
                         kind=CompletionItemKind.Method,
                         documentation=info["documentation"],
                     )
                 )
-        completions.sort(
-            key=lambda x: 0 if x.kind == CompletionItemKind.Field else 10
-        )
-        return completions
+        return field_items + other_items
 
 
 class Module:
@@ -391,8 +616,13 @@ class Module:
             tuple[str, str], tuple[PoolKind, Dependencies]
         ] = self._get_modules_per_class()
         self._module_info: dict = module_info
+        # The xml files of the module are only read when their records are
+        # first needed, see _load_fs_ids
+        self._fs_ids_loaded: bool = False
         self._model_data: dict[str, tuple[Dependencies, etree.Element]] = {}
-        self._load_fs_ids()
+        # keys: view file name
+        # values: module_list / view type / model name
+        self._view_infos: dict[str, tuple[Dependencies, str, str] | None] = {}
 
     def _get_path(self) -> Path:
         try:
@@ -428,40 +658,86 @@ class Module:
     def get_model_data(
         self, fs_id: str
     ) -> tuple[Dependencies, etree.Element] | None:
-        if self._model_data:
-            return self._model_data.get(fs_id, None)
-        return None
+        self._load_fs_ids()
+        return self._model_data.get(fs_id, None)
 
     def _load_fs_ids(self) -> None:
+        if self._fs_ids_loaded:
+            return
+        self._fs_ids_loaded = True
         for xml_file in self._module_info["xml"]:
             self._model_data.update(self._extract_fs_ids_infos(xml_file))
+        self._index_views()
+
+    def _index_views(self) -> None:
+        for module_list, record in self._model_data.values():
+            if record.attrib.get("model", "") != "ir.ui.view":
+                continue
+            # Single pass on the fields rather than one query per field, the
+            # first field with a given name wins
+            fields: dict[str, str] = {}
+            for field in record.iterchildren("field"):
+                fields.setdefault(field.attrib.get("name", ""), field.text)
+            if "name" not in fields:
+                continue
+            filename = fields["name"]
+            if filename in self._view_infos:
+                # Only the first matching record is relevant
+                continue
+            if "model" not in fields or "type" not in fields:
+                self._view_infos[filename] = None
+            else:
+                self._view_infos[filename] = (
+                    module_list,
+                    fields["type"],
+                    fields["model"],
+                )
 
     def _extract_fs_ids_infos(
         self, filename: str
     ) -> dict[str, tuple[Dependencies, etree.Element]]:
+        # Records (with an id) of the <data> nodes of the <tryton> root,
+        # streamed so that only them are kept in memory
+        per_fs_ids = {}
+        modules: Dependencies | None = None
+        depth = 0
         try:
-            with open(self._path / filename) as f:
-                parsed = etree.parse(BytesIO(f.read().encode("UTF-8")))
+            for event, element in etree.iterparse(
+                str(self._path / filename), events=("start", "end")
+            ):
+                if event == "start":
+                    depth += 1
+                    if depth == 1 and element.tag != "tryton":
+                        return {}
+                    if depth == 2 and element.tag == "data":
+                        modules = self._data_modules(element)
+                    continue
+                depth -= 1
+                if depth == 1:
+                    modules = None
+                elif depth == 2:
+                    if (
+                        modules is not None
+                        and element.tag == "record"
+                        and "id" in element.attrib
+                    ):
+                        per_fs_ids[element.attrib["id"]] = (modules, element)
+                    # Kept records stay alive once detached
+                    element.getparent().remove(element)
         except etree.XMLSyntaxError:
             return {}
-        per_fs_ids = {}
-        for data_node in parsed.xpath("/tryton/data"):
-            modules = tuple(
-                sorted(
-                    [self._name]
-                    + [
-                        x.strip()
-                        for x in data_node.attrib.get("depends", "").split(",")
-                        if x.strip()
-                    ]
-                )
-            )
-            for record in data_node.xpath("record"):
-                if "id" not in record.attrib:
-                    continue
-                per_fs_ids[record.attrib["id"]] = (modules, record)
         return per_fs_ids
 
+    def _data_modules(self, data_node: etree.Element) -> Dependencies:
+        return self._manager.get_dependencies(
+            [self._name]
+            + [
+                x.strip()
+                for x in data_node.attrib.get("depends", "").split(",")
+                if x.strip()
+            ]
+        )
+
     def get_view_info(
         self, filename: str
     ) -> tuple[Dependencies, str, str] | None:
@@ -474,20 +750,8 @@ class Module:
             - The view type (inherit / tree / form...)
             - The model the view is associated to
         """
-        for module_list, record in self._model_data.values():
-            if record.attrib.get("model", "") != "ir.ui.view":
-                continue
-            view_file_name = record.xpath("field[@name='name']")
-            if not view_file_name:
-                continue
-            if view_file_name[0].text != filename:
-                continue
-            model_name = record.xpath("field[@name='model']")
-            view_type = record.xpath("field[@name='type']")
-            if not model_name or not view_type:
-                return None
-            return (module_list, view_type[0].text, model_name[0].text)
-        return None
+        self._load_fs_ids()
+        return self._view_infos.get(filename)
 
     def _get_modules_per_class(
         self,
@@ -496,20 +760,24 @@ class Module:
         with open(self._path / "__init__.py") as f:
             parsed_init = ast.parse(f.read())
 
-        for register_call in ast.walk(parsed_init):
+        # The register function is defined at the top level of the file
+        for register_call in parsed_init.body:
             if (
                 isinstance(register_call, ast.FunctionDef)
                 and register_call.name == "register"
             ):
                 type_: PoolKind
                 for node in register_call.body:
+                    if not isinstance(node, ast.Expr) or not isinstance(
+                        node.value, ast.Call
+                    ):
+                        continue
+                    func = node.value.func
                     if (
-                        not isinstance(node, ast.Expr)
-                        or not isinstance(node.value, ast.Call)
-                        or not isinstance(node.value.func, ast.Attribute)
-                        or node.value.func.attr != "register"
-                        or not isinstance(node.value.func.value, ast.Name)
-                        or node.value.func.value.id != "Pool"
+                        not isinstance(func, ast.Attribute)
+                        or func.attr != "register"
+                        or not isinstance(func.value, ast.Name)
+                        or func.value.id != "Pool"
                     ):
                         continue
                     modules = [self._name]
@@ -537,7 +805,7 @@ class Module:
                         {
                             (file_name, class_name): (
                                 type_,
-                                tuple(sorted(modules)),
+                                self._manager.get_dependencies(modules),
                             )
                             for file_name, class_name in cur_imports
                         }
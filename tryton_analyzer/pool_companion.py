@@ -1,9 +1,10 @@
 import atexit
 import os
 import signal
-from multiprocessing import Queue, get_context
-from threading import RLock
-from typing import TYPE_CHECKING, Any
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable
 
 if TYPE_CHECKING:
     from trytond.pool import Pool
@@ -42,14 +43,16 @@ def kill_child(pid: int | None) -> None:
 class Companion:
     def __init__(self) -> None:
         super().__init__()
-        self._lock = RLock()
+        self._lock = Lock()
         context = get_context("spawn")
-        self._queue_in: Queue = context.Queue()
-        self._queue_out: Queue = context.Queue()
-        self._process = context.Process(
-            target=main, args=[self._queue_out, self._queue_in]
-        )
+        # A pipe rather than queues, so that messages are sent directly
+        # without going through feeder threads
+        self._connection, child_connection = context.Pipe(duplex=True)
+        self._process = context.Process(target=main, args=[child_connection])
         self._process.start()
+        # Only the child process keeps its end open, so that reading from a
+        # dead companion fails rather than blocking
+        child_connection.close()
         # Keep a reference to the killer function to be able to unregister it
         self._killer = lambda: kill_child(self._process.pid)
         atexit.register(self._killer)
@@ -58,6 +61,8 @@ class Companion:
         with self._lock:
             if self._process:
                 self._process.kill()
+                self._process.join()
+                self._connection.close()
                 atexit.unregister(self._killer)
 
     def is_alive(self) -> bool:
@@ -71,11 +76,14 @@ class Companion:
         """
         Calls the companion process for informations
         """
-        # Since we are using a queuing mechanism, we have to lock to avoid
-        # wrong call orders
+        # Since we are using a single pipe, we have to lock to avoid wrong
+        # call orders
         with self._lock:
-            self._queue_out.put((command, parameters))
-            return_value, result = self._queue_in.get()
+            try:
+                self._connection.send((command, parameters))
+                return_value, result = self._connection.recv()
+            except (EOFError, OSError) as e:
+                raise CompanionCrashedError(repr(e))
             if return_value == COMPANION_CRASHED:
                 raise CompanionCrashedError(result)
             return result
@@ -111,7 +119,7 @@ class Companion:
         return self._call(COMPANION_COMMAND_GET_COMPLETIONS, (key, name, kind))
 
 
-def main(queue_in: Queue, queue_out: Queue) -> None:
+def main(connection: Connection) -> None:
     """
     The main function of the spawned process. It basically initialize the
     tryton Pool, then wait for instructions.
@@ -125,33 +133,18 @@ def main(queue_in: Queue, queue_out: Queue) -> None:
         os.environ["TRYTON_ANALYZER_RUNNING"] = "1"
         pools: dict["Dependencies", "Pool"] = _init()
         while True:
-            instruction, parameters = queue_in.get()
-            if instruction == COMPANION_COMMAND_INIT_POOL:
-                queue_out.put(
-                    (COMPANION_RESULT_OK, _init_pool(parameters, pools))
-                )
-            elif instruction == COMPANION_COMMAND_MODULE_INFO:
-                from trytond.modules import get_module_info
-
-                queue_out.put(
-                    (COMPANION_RESULT_OK, get_module_info(parameters[0]))
-                )
-            elif instruction == COMPANION_COMMAND_GET_MODEL:
-                queue_out.put(
-                    (COMPANION_RESULT_OK, _get_model(parameters, pools))
-                )
-            elif instruction == COMPANION_COMMAND_GET_SUPER_CALLS:
-                queue_out.put(
-                    (COMPANION_RESULT_OK, _get_super_calls(parameters, pools))
-                )
-            elif instruction == COMPANION_COMMAND_GET_COMPLETIONS:
-                queue_out.put(
-                    (COMPANION_RESULT_OK, _get_completions(parameters, pools))
-                )
+            instruction, parameters = connection.recv()
+            handler = COMMAND_HANDLERS.get(instruction)
+            if handler is None:
+                connection.send((COMPANION_UNEXPECTED_COMMAND, instruction))
             else:
-                queue_out.put((COMPANION_UNEXPECTED_COMMAND, instruction))
+                connection.send(
+                    (COMPANION_RESULT_OK, handler(parameters, pools))
+                )
     except Exception as e:
-        queue_out.put((COMPANION_CRASHED, traceback.print_exception(e)))
+        connection.send(
+            (COMPANION_CRASHED, "".join(traceback.format_exception(e)))
+        )
 
 
 def _init() -> dict["Dependencies", "Pool"]:
@@ -187,6 +180,36 @@ def _init_pool(
     }
 
 
+def _get_module_info(
+    parameters: list[Any], pools: dict["Dependencies", "Pool"]
+) -> dict:
+    """
+    Returns the informations of a module (as found in its tryton.cfg)
+    """
+    from trytond.modules import get_module_info
+
+    return get_module_info(parameters[0])
+
+
+def _field_relation(field: Any, pool: "Pool") -> str:
+    return field.model_name
+
+
+def _many2many_relation(field: Any, pool: "Pool") -> str:
+    if field.target:
+        return pool.get(field.relation_name)._fields[field.target].model_name
+    return field.relation_name
+
+
+# keys: relation field types
+# values: function returning the target model of such a field
+FIELD_RELATIONS: dict[str, Callable[[Any, "Pool"], str]] = {
+    "many2one": _field_relation,
+    "one2many": _field_relation,
+    "many2many": _many2many_relation,
+}
+
+
 def _get_model(
     parameters: list[Any], pools: dict["Dependencies", "Pool"]
 ) -> dict[str, dict[str, Any] | set]:
@@ -199,25 +222,20 @@ def _get_model(
     # assert key in pools
     pool = pools[key]
     model = pool.get(name, type=kind)
-    result: dict[str, dict[str, Any] | set] = {"attrs": set(dir(model))}
+    attrs = set(dir(model))
+    result: dict[str, dict[str, Any] | set] = {"attrs": attrs}
     if kind == "model":
+        # Fields are sent with their details, no need to send them twice
+        attrs.difference_update(model._fields)
         fields = {}
         for fname, field in model._fields.items():
-            fields[fname] = {
+            field_info = fields[fname] = {
                 "string": field.string,
                 "type": field._type,
             }
-            if field._type in ("many2one", "one2many"):
-                fields[fname]["relation"] = field.model_name
-            elif field._type == "many2many":
-                if field.target:
-                    fields[fname]["relation"] = (
-                        pool.get(field.relation_name)
-                        ._fields[field.target]
-                        .model_name
-                    )
-                else:
-                    fields[fname]["relation"] = field.relation_name
+            get_relation = FIELD_RELATIONS.get(field._type)
+            if get_relation is not None:
+                field_info["relation"] = get_relation(field, pool)
         result["fields"] = fields
     elif kind == "wizard":
         states = {}
@@ -238,19 +256,25 @@ def _get_super_calls(
     """
     key, kind, name, func_name = parameters
     model = pools[key].get(name, type=kind)
-    result: list[tuple[str, str | None | tuple[int, int]]] = []
+    # Classes are identified by their module / qualified name, which is
+    # shorter than str(klass) and does not need to be parsed
+    result: list[tuple[str, str, str | None | tuple[str, int]]] = []
     for klass in model.mro():
-        if func_name not in dir(klass):
-            result.append((str(klass), None))
+        # Only definitions on the class itself are relevant, inherited ones
+        # are found on their own class later in the mro
+        if func_name not in vars(klass):
+            result.append((klass.__module__, klass.__qualname__, None))
             continue
+        # getattr rather than the raw class attribute to unwrap classmethods
         parent_func = getattr(klass, func_name)
         code_object = getattr(parent_func, "__code__", None)
         if code_object is None:
-            result.append((str(klass), "no_code"))
+            result.append((klass.__module__, klass.__qualname__, "no_code"))
             continue
         result.append(
             (
-                str(klass),
+                klass.__module__,
+                klass.__qualname__,
                 (
                     code_object.co_filename,
                     code_object.co_firstlineno,
@@ -266,41 +290,60 @@ def _get_completions(
     """
     Returns possible completions for a given model
     """
+    import inspect
+
     from trytond.model import fields
 
     key, name, kind = parameters
     model = pools[key].get(name, type=kind)
+    # Fields of models / states of wizards, other attributes are methods
+    members: dict[str, Any] = {}
+    if kind == "model":
+        members = model._fields
+    elif kind == "wizard":
+        members = model._states
     result = {}
     for elem in dir(model):
-        if kind == "model" and elem in model._fields:
-            field = model._fields[elem]
+        member = members.get(elem)
+        if member is None:
+            # Static lookup, so that descriptors (which may raise) are not
+            # evaluated only to get their documentation
+            result[elem] = {
+                "type": "method",
+                "documentation": getattr(
+                    inspect.getattr_static(model, elem, None), "__doc__", None
+                ),
+            }
+        elif kind == "model":
             field_info = {
                 "type": "field",
-                "class_name": str(field.__class__),
-                "string": field.string,
+                "class_name": str(member.__class__),
+                "string": member.string,
             }
-            if isinstance(field, fields.Function):
+            if isinstance(member, fields.Function):
                 field_info["function"] = True
-            if field.domain:
-                field_info["domain"] = str(field.domain)
-            if field.states:
-                field_info["states"] = str(field.states)
-            if isinstance(field, fields.Selection):
-                if isinstance(field.selection, (tuple, list)):
-                    field_info["selection"] = list(field.selection)
+            if member.domain:
+                field_info["domain"] = str(member.domain)
+            if member.states:
+                field_info["states"] = str(member.states)
+            if isinstance(member, fields.Selection):
+                if isinstance(member.selection, (tuple, list)):
+                    field_info["selection"] = list(member.selection)
             result[elem] = field_info
-        elif kind == "wizard" and elem in model._states:
-            result[elem] = {
-                "type": "state",
-                "class_name": str(model._states[elem].__class__),
-            }
         else:
-            try:
-                documentation = getattr(model, elem).__doc__
-            except NotImplementedError:
-                documentation = ""
             result[elem] = {
-                "type": "method",
-                "documentation": documentation,
+                "type": "state",
+                "class_name": str(member.__class__),
             }
     return result
+
+
+COMMAND_HANDLERS: dict[
+    str, Callable[[list[Any], dict["Dependencies", "Pool"]], Any]
+] = {
+    COMPANION_COMMAND_INIT_POOL: _init_pool,
+    COMPANION_COMMAND_MODULE_INFO: _get_module_info,
+    COMPANION_COMMAND_GET_MODEL: _get_model,
+    COMPANION_COMMAND_GET_SUPER_CALLS: _get_super_calls,
+    COMPANION_COMMAND_GET_COMPLETIONS: _get_completions,
+}
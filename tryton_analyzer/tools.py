@@ -1,6 +1,8 @@
-import pprint
+import re
+import sys
+from collections.abc import Iterable
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional, Union, cast
 
 import libcst as cst
 import libcst.matchers as m
@@ -16,6 +18,11 @@ if TYPE_CHECKING:
 class Diagnostic:
     err_code: str
     severity: DiagnosticSeverity
+    # Names of the message data, stored as attributes of the same name
+    message_fields: tuple[str, ...] = ()
+    _severity_str: str
+    _err_code_str: str
+    __slots__ = ("_position", "_filepath", "_formatted_message")
 
     def __init__(
         self,
@@ -25,21 +32,32 @@ class Diagnostic:
     ) -> None:
         self._position = position
         self._filepath = filepath
+        self._formatted_message: str | None = None
         self._init_message_data(message_data or {})
 
     def __repr__(self) -> str:
-        value = f"[{self.severity}]"
-        value = self.format_severity()
-        value += self.format_error_code()
-        value += self.format_location()
-        value += self.format_message()
-        return value
+        return "".join(
+            (
+                self.format_severity(),
+                self.format_error_code(),
+                self.format_location(),
+                self.get_message(),
+            )
+        )
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Formatted once per class rather than for each diagnostic
+        if hasattr(cls, "severity"):
+            cls._severity_str = f"[{cls.severity.name}]"
+        if hasattr(cls, "err_code"):
+            cls._err_code_str = f"[tryton-ls-{cls.err_code}]"
 
     def format_severity(self) -> str:
-        return f"[{self.severity.name}]"
+        return self._severity_str
 
     def format_error_code(self) -> str:
-        return f"[tryton-ls-{self.err_code}]"
+        return self._err_code_str
 
     def format_location(self) -> str:
         return f" @ {self._filepath} L{self._position.start.line} "
@@ -47,7 +65,17 @@ class Diagnostic:
     def format_message(self) -> str:
         raise NotImplementedError
 
+    def get_message(self) -> str:
+        """
+        The formatted message, which is only built once per diagnostic
+        """
+        if self._formatted_message is None:
+            self._formatted_message = self.format_message()
+        return self._formatted_message
+
     def _init_message_data(self, message_data: dict[str, str]) -> None:
+        for name in self.message_fields:
+            setattr(self, name, message_data.pop(name))
         if message_data:
             raise ValueError
 
@@ -64,7 +92,7 @@ class Diagnostic:
                 ),
             ),
             severity=self.severity,
-            message=f"{self.err_code}: {self.format_message()}",
+            message=f"{self.err_code}: {self.get_message()}",
             code=self.err_code,
             source="TrytonLSP",
         )
@@ -73,6 +101,7 @@ class Diagnostic:
 class DebugDiagnostic(Diagnostic):
     err_code = "----"
     severity = DiagnosticSeverity.Information
+    __slots__ = ("_message",)
 
     def __init__(
         self, position: CodeRange, filepath: Path, message: str
@@ -95,6 +124,8 @@ class DebugDiagnostic(Diagnostic):
 
 
 class ModuleDiagnostic(Diagnostic):
+    __slots__ = ("_module_name",)
+
     def __init__(
         self,
         position: CodeRange,
@@ -107,6 +138,8 @@ class ModuleDiagnostic(Diagnostic):
 
 
 class ModelDiagnostic(ModuleDiagnostic):
+    __slots__ = ("_model_name", "_class_name")
+
     def __init__(
         self,
         position: CodeRange,
@@ -135,6 +168,8 @@ class ModelDiagnostic(ModuleDiagnostic):
 
 
 class FunctionDiagnostic(ModelDiagnostic):
+    __slots__ = ("_function_name",)
+
     def __init__(
         self,
         position: CodeRange,
@@ -173,6 +208,7 @@ class FunctionDiagnostic(ModelDiagnostic):
 class MissingRegisterInInit(ModelDiagnostic):
     err_code = "0001"
     severity = DiagnosticSeverity.Warning
+    __slots__ = ()
 
     def format_message(self) -> str:
         return (
@@ -184,6 +220,7 @@ class MissingRegisterInInit(ModelDiagnostic):
 class DuplicateName(ModelDiagnostic):
     err_code = "0002"
     severity = DiagnosticSeverity.Warning
+    __slots__ = ()
 
     def format_message(self) -> str:
         return f"Class {self._class_name} has multiple __name__ definition "
@@ -192,6 +229,7 @@ class DuplicateName(ModelDiagnostic):
 class ConflictingName(ModelDiagnostic):
     err_code = "0003"
     severity = DiagnosticSeverity.Error
+    __slots__ = ()
 
     def format_message(self) -> str:
         return (
@@ -203,6 +241,7 @@ class ConflictingName(ModelDiagnostic):
 class SuperInvocationWithParams(FunctionDiagnostic):
     err_code = "1001"
     severity = DiagnosticSeverity.Information
+    __slots__ = ()
 
     def format_message(self) -> str:
         return "'super' invocation does not need parameters"
@@ -211,11 +250,10 @@ class SuperInvocationWithParams(FunctionDiagnostic):
 class SuperInvocationMismatchedName(FunctionDiagnostic):
     err_code = "1002"
     severity = DiagnosticSeverity.Error
+    message_fields = ("expected_name",)
+    __slots__ = message_fields
     expected_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.expected_name = message_data.pop("expected_name")
-
     def format_message(self) -> str:
         return (
             "'super' call must use the same name "
@@ -226,6 +264,7 @@ class SuperInvocationMismatchedName(FunctionDiagnostic):
 class SuperWithoutParent(FunctionDiagnostic):
     err_code = "1003"
     severity = DiagnosticSeverity.Error
+    __slots__ = ()
 
     def format_message(self) -> str:
         return "No parent found for super call in parent modules"
@@ -234,6 +273,7 @@ class SuperWithoutParent(FunctionDiagnostic):
 class MissingSuperCall(FunctionDiagnostic):
     err_code = "1004"
     severity = DiagnosticSeverity.Error
+    __slots__ = ()
 
     def format_message(self) -> str:
         return "Missing super call!"
@@ -242,11 +282,10 @@ class MissingSuperCall(FunctionDiagnostic):
 class UnknownPoolKey(FunctionDiagnostic):
     err_code = "1005"
     severity = DiagnosticSeverity.Error
+    message_fields = ("possible_values",)
+    __slots__ = message_fields
     possible_values: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.possible_values = message_data.pop("possible_values")
-
     def format_message(self) -> str:
         return (
             "Unknown type for Pool().get, possible values are: "
@@ -257,11 +296,10 @@ class UnknownPoolKey(FunctionDiagnostic):
 class UnknownModel(FunctionDiagnostic):
     err_code = "1006"
     severity = DiagnosticSeverity.Error
+    message_fields = ("unknown_name",)
+    __slots__ = message_fields
     unknown_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.unknown_name = message_data.pop("unknown_name")
-
     def format_message(self) -> str:
         return f"Could not find '{self.unknown_name}' in the pool"
 
@@ -269,13 +307,11 @@ class UnknownModel(FunctionDiagnostic):
 class UnknownAttribute(FunctionDiagnostic):
     err_code = "1007"
     severity = DiagnosticSeverity.Error
+    message_fields = ("attr_name", "model_name")
+    __slots__ = message_fields
     attr_name: str
     model_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.attr_name = message_data.pop("attr_name")
-        self.model_name = message_data.pop("model_name")
-
     def format_message(self) -> str:
         return f"Unknown attribute '{self.attr_name}' on model '{self.model_name}'"
 
@@ -283,18 +319,18 @@ class UnknownAttribute(FunctionDiagnostic):
 class ChangeVariableModel(FunctionDiagnostic):
     err_code = "1008"
     severity = DiagnosticSeverity.Warning
+    message_fields = ("previous_model", "new_model")
+    __slots__ = message_fields
     previous_model: str
     new_model: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.previous_model = message_data.pop("previous_model")
-        self.new_model = message_data.pop("new_model")
-
     def format_message(self) -> str:
         return f"Switching models, from '{self.previous_model}' to '{self.new_model}'"
 
 
 class XMLDiagnostic(Diagnostic):
+    __slots__ = ()
+
     @classmethod
     def init_from_analyzer(
         cls,
@@ -312,6 +348,7 @@ class XMLDiagnostic(Diagnostic):
 class TrytonTagNotFound(XMLDiagnostic):
     err_code = "5000"
     severity = DiagnosticSeverity.Error
+    __slots__ = ()
 
     def __init__(
         self,
@@ -332,6 +369,7 @@ class TrytonTagNotFound(XMLDiagnostic):
 class TrytonXmlFileUnregistered(XMLDiagnostic):
     err_code = "5001"
     severity = DiagnosticSeverity.Warning
+    __slots__ = ()
 
     def __init__(
         self,
@@ -352,11 +390,10 @@ class TrytonXmlFileUnregistered(XMLDiagnostic):
 class UnexpectedXMLTag(XMLDiagnostic):
     err_code = "5002"
     severity = DiagnosticSeverity.Error
+    message_fields = ("tag_name",)
+    __slots__ = message_fields
     tag_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.tag_name = message_data.pop("tag_name")
-
     def format_message(self) -> str:
         return f"Unexpected element '<{self.tag_name}>' here"
 
@@ -364,11 +401,10 @@ class UnexpectedXMLTag(XMLDiagnostic):
 class RecordMissingAttribute(XMLDiagnostic):
     err_code = "5003"
     severity = DiagnosticSeverity.Error
+    message_fields = ("attr_name",)
+    __slots__ = message_fields
     attr_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.attr_name = message_data.pop("attr_name")
-
     def format_message(self) -> str:
         return f"Missing '{self.attr_name}' attribute"
 
@@ -376,11 +412,10 @@ class RecordMissingAttribute(XMLDiagnostic):
 class RecordUnknownModel(XMLDiagnostic):
     err_code = "5004"
     severity = DiagnosticSeverity.Error
+    message_fields = ("model_name",)
+    __slots__ = message_fields
     model_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.model_name = message_data.pop("model_name")
-
     def format_message(self) -> str:
         return f"Model '{self.model_name}' does not exist in this context"
 
@@ -388,13 +423,11 @@ class RecordUnknownModel(XMLDiagnostic):
 class RecordUnknownField(XMLDiagnostic):
     err_code = "5005"
     severity = DiagnosticSeverity.Error
+    message_fields = ("model_name", "field_name")
+    __slots__ = message_fields
     model_name: str
     field_name: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.model_name = message_data.pop("model_name")
-        self.field_name = message_data.pop("field_name")
-
     def format_message(self) -> str:
         return (
             f"Unknown field '{self.field_name}' on model '{self.model_name}'"
@@ -404,31 +437,62 @@ class RecordUnknownField(XMLDiagnostic):
 class RecordDuplicateId(XMLDiagnostic):
     err_code = "5006"
     severity = DiagnosticSeverity.Error
+    message_fields = ("fs_id", "other_line")
+    __slots__ = message_fields
     fs_id: str
     other_line: str
 
-    def _init_message_data(self, message_data: dict[str, str]) -> None:
-        self.fs_id = message_data.pop("fs_id")
-        self.other_line = message_data.pop("other_line")
-
     def format_message(self) -> str:
         return f"Id {self.fs_id} is already defined line {self.other_line}"
 
 
-def print_diagnostics(module_name: str, diagnostics: list[Diagnostic]) -> None:
-    print(module_name)
-    pprint.pprint(diagnostics)
-
-
-def ignore_error_code(node: cst.CSTNode, ignore_code: str) -> bool:
+def print_diagnostics(
+    module_name: str, diagnostics: Iterable[Diagnostic]
+) -> None:
+    # Diagnostics are written as they come, so that generated ones are shown
+    # without waiting for the whole module
+    write = sys.stdout.write
+    write(module_name + "\n")
+    for diagnostic in diagnostics:
+        write(f"{diagnostic!r}\n")
+
+
+def string_value(node: cst.SimpleString) -> str:
+    """
+    The value of a string literal. Plain strings (the vast majority) are
+    sliced, prefixed / triple quoted / escaped ones are evaluated
+    """
+    raw = node.value
+    if raw[0] in "\"'" and "\\" not in raw and raw[:3] not in ('"""', "'''"):
+        return raw[1:-1]
+    value = node.evaluated_value
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return value
+
+
+COMMENT_MATCHER = m.Comment()
+IGNORE_ERROR_CODE = re.compile(r"IGNORE-TRYTON-LS-(.{4})")
+
+
+def ignored_error_codes(text: str) -> frozenset[str]:
+    """
+    Returns the error codes ignored (IGNORE-TRYTON-LS-XXXX) in a text, in a
+    single pass
+    """
+    if "IGNORE-TRYTON-LS-" not in text:
+        return frozenset()
+    return frozenset(IGNORE_ERROR_CODE.findall(text))
+
+
+def node_ignored_error_codes(node: cst.CSTNode) -> frozenset[str]:
+    """
+    Returns the error codes ignored in all the comments of a node
+    """
     # TODO: tox.ini to allow for global deactivations
-    return bool(
-        m.extractall(
-            node,
-            m.Comment(
-                value=m.MatchIfTrue(
-                    lambda value: f"IGNORE-TRYTON-LS-{ignore_code}" in value
-                )
-            ),
+    return frozenset().union(
+        *(
+            ignored_error_codes(cast(cst.Comment, comment).value)
+            for comment in m.findall(node, COMMENT_MATCHER)
         )
     )
@@ -1,17 +1,48 @@
 #!/usr/bin/env python
+import os
 import sys
 from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 from .pool import PoolManager
-from .tools import print_diagnostics
+from .tools import Diagnostic, print_diagnostics
 
 
-def print_modules_diagnostics(module_names: Sequence[str]) -> None:
+def get_module_diagnostics(module_name: str) -> list[Diagnostic]:
+    """
+    Analyze a module with a dedicated pool manager (and companion)
+    """
     manager = PoolManager()
-    for module_name in module_names:
-        print_diagnostics(
-            module_name, manager.generate_module_diagnostics(module_name)
-        )
+    try:
+        return list(manager.generate_module_diagnostics(module_name))
+    finally:
+        manager.close()
+
+
+def print_modules_diagnostics(module_names: Sequence[str]) -> None:
+    if len(module_names) < 2:
+        # Not materialized, so that diagnostics are printed file by file
+        for module_name in module_names:
+            manager = PoolManager()
+            try:
+                print_diagnostics(
+                    module_name,
+                    manager.generate_module_diagnostics(module_name),
+                )
+            finally:
+                manager.close()
+        return
+    # Modules are analyzed in parallel, each worker having its own companion
+    # process, hence the halved number of workers
+    max_workers = min(len(module_names), max(1, (os.cpu_count() or 1) // 2))
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=get_context("spawn")
+    ) as executor:
+        for module_name, diagnostics in zip(
+            module_names, executor.map(get_module_diagnostics, module_names)
+        ):
+            print_diagnostics(module_name, diagnostics)
 
 
 def run() -> None:
@@ -23,7 +54,12 @@ def run() -> None:
         print(
             """Print diagnostics for a whole module
 
-usage: tryton_lint [module1] [module2] ..."""
+usage: tryton_lint [module1] [module2] ...
+
+When several modules are given, they are analyzed in parallel, each one in
+its own process with its own Tryton pools. Pools are not shared between
+modules, so common dependencies are loaded once per module, and each worker
+(and its companion process) holds a full Tryton import in memory."""
         )
     else:
         print_modules_diagnostics(sys.argv[1:])
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
-import re
+import asyncio
+import heapq
 import sys
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable, TypeVar
 
 from libcst.metadata import CodeRange
 from lsprotocol.types import (
@@ -12,6 +17,9 @@ from lsprotocol.types import (
     CompletionItem,
     CompletionList,
     CompletionParams,
+)
+from lsprotocol.types import Diagnostic as LspDiagnostic
+from lsprotocol.types import (
     DidChangeTextDocumentParams,
     DidOpenTextDocumentParams,
     DidSaveTextDocumentParams,
@@ -24,6 +32,110 @@ from pygls.server import LanguageServer
 from pygls.workspace import Document
 
 from .pool import PoolManager
+from .tools import Diagnostic
+
+T = TypeVar("T")
+
+# Number of completion lists kept in cache
+COMPLETION_CACHE_SIZE = 8
+# Delay (in seconds) without changes before updating the diagnostics of a
+# modified document
+DIAGNOSTICS_DELAY = 0.15
+# Shared result when there is nothing to complete, it must not be modified
+EMPTY_COMPLETIONS = CompletionList(is_incomplete=False, items=[])
+
+
+def text_end(start: Position, text: str) -> Position:
+    """
+    The position of the end of text once inserted at start
+    """
+    added_lines = text.count("\n")
+    if added_lines:
+        return Position(
+            line=start.line + added_lines,
+            character=len(text) - text.rfind("\n") - 1,
+        )
+    return Position(line=start.line, character=start.character + len(text))
+
+
+def rebase_range(range: Range, change: Range, text: str) -> Range:
+    """
+    Moves a range of a document so that it matches the document after change
+    was replaced by text. Range boundaries in the replaced part are moved to
+    the boundaries of the new text
+    """
+    new_end = text_end(change.start, text)
+
+    def move(position: Position, inside: Position) -> Position:
+        if (position.line, position.character) <= (
+            change.start.line,
+            change.start.character,
+        ):
+            return position
+        if (position.line, position.character) < (
+            change.end.line,
+            change.end.character,
+        ):
+            return inside
+        if position.line == change.end.line:
+            return Position(
+                line=new_end.line,
+                character=new_end.character
+                + position.character
+                - change.end.character,
+            )
+        return Position(
+            line=position.line + new_end.line - change.end.line,
+            character=position.character,
+        )
+
+    return Range(
+        start=move(range.start, change.start), end=move(range.end, new_end)
+    )
+
+
+def merge_ranges(ranges: list[Range]) -> list[Range]:
+    """
+    Merges overlapping ranges, the result is sorted
+    """
+    merged: list[Range] = []
+    for range in sorted(
+        ranges, key=lambda x: (x.start.line, x.start.character)
+    ):
+        if merged and (range.start.line, range.start.character) <= (
+            merged[-1].end.line,
+            merged[-1].end.character,
+        ):
+            last = merged[-1]
+            if (range.end.line, range.end.character) > (
+                last.end.line,
+                last.end.character,
+            ):
+                merged[-1] = Range(start=last.start, end=range.end)
+        else:
+            merged.append(range)
+    return merged
+
+
+def fuzzy_score(needle: str, haystack: str) -> int | None:
+    """
+    How well haystack matches needle (lower is better), or None if haystack
+    does not contain the characters of needle in the same order.
+
+    Characters skipped between matches are penalized, matches at the start
+    of a word are favored
+    """
+    score = 0
+    position = 0
+    for char in needle:
+        found = haystack.find(char, position)
+        if found == -1:
+            return None
+        score += found - position
+        if found == 0 or haystack[found - 1] == "_":
+            score -= 1
+        position = found + 1
+    return score
 
 
 def log_debug(log: str) -> None:
@@ -42,9 +154,47 @@ class TrytonServer(LanguageServer):
         # if we want to load an up to date pool), it can be dropped and it will
         # be respawned when needed
         self._pool_manager: PoolManager | None = None
-        # Cache for completions
-        self._last_complete_position: tuple[int, int] = (0, 0)
-        self._last_completion: list[CompletionItem] | None = None
+        # Cache for completions, so that they are only computed once while
+        # typing the filter
+        # keys: document uri / source up to the completed attribute, so that
+        # modifying the completed expression (or anything before it)
+        # invalidates the entry
+        # values: the completion items, most recently used last
+        self._completion_cache: OrderedDict[
+            tuple[str, str], CachedCompletions
+        ] = OrderedDict()
+        # Ranges of documents which were modified since their diagnostics
+        # were last updated, and the pending update of these diagnostics
+        self._pending_ranges: dict[str, list[Range]] = {}
+        self._pending_diagnostics: dict[str, asyncio.TimerHandle] = {}
+        # Running updates of the diagnostics which were not requested by the
+        # client, kept alive until they are done
+        self._diagnostics_tasks: set[asyncio.Task] = set()
+        # Diagnostics and completions are computed out of the event loop so
+        # that the server stays responsive. The pool manager is not thread
+        # safe, so everything that uses it goes through a single thread
+        self._worker = ThreadPoolExecutor(max_workers=1)
+        # keys: document uri
+        # values: path of the document
+        self._document_paths: dict[str, Path] = {}
+
+    def run_in_worker(
+        self, func: Callable[..., T], *args: Any
+    ) -> asyncio.Future[T]:
+        """
+        Runs func in the thread dedicated to the pool manager
+        """
+        return asyncio.get_running_loop().run_in_executor(
+            self._worker, func, *args
+        )
+
+    def _get_document_path(self, text_document: Document) -> Path:
+        path = self._document_paths.get(text_document.uri)
+        if path is None:
+            path = self._document_paths[text_document.uri] = Path(
+                text_document.path
+            )
+        return path
 
     def get_pool_manager(self) -> PoolManager:
         """
@@ -63,10 +213,21 @@ class TrytonServer(LanguageServer):
             return
         self._pool_manager.close()
         self._pool_manager = None
-        self._last_complete_position = (0, 0)
-        self._last_completion = None
+        self._completion_cache.clear()
 
-    def generate_diagnostics(self, uri: str, ranges: list[Range]) -> None:
+    async def update_diagnostics(self, uri: str, ranges: list[Range]) -> None:
+        """
+        Computes the diagnostics of a document in the worker thread, then
+        publishes them from the event loop
+        """
+        diagnostics = await self.run_in_worker(
+            self.generate_diagnostics, uri, ranges
+        )
+        self.publish_diagnostics(uri, diagnostics)
+
+    def generate_diagnostics(
+        self, uri: str, ranges: list[Range]
+    ) -> list[LspDiagnostic]:
         """
         Entrypoint for LSP diagnostics. Transforms the inputs which are pygls
         types into Tryton / Libcst types
@@ -74,22 +235,81 @@ class TrytonServer(LanguageServer):
         log_debug(f"starting diagnostic generation for {uri}")
         text_document = self.workspace.get_document(uri)
         source_data = text_document.source
-        document_path = Path(text_document.path)
+        document_path = self._get_document_path(text_document)
         diagnostics = self.get_pool_manager().generate_diagnostics(
             document_path,
             data=source_data,
-            ranges=[
-                CodeRange(
-                    (range.start.line, range.start.character),
-                    (range.end.line, range.end.character),
-                )
-                for range in ranges
-            ],
-        )
-        self.publish_diagnostics(
-            uri, [x.to_lsp_diagnostic() for x in diagnostics]
+            ranges=(
+                [
+                    CodeRange(
+                        (range.start.line, range.start.character),
+                        (range.end.line, range.end.character),
+                    )
+                    for range in ranges
+                ]
+                if ranges
+                else None
+            ),
         )
         log_debug(f"Completed diagnostic generation for {uri}")
+        return list(map(Diagnostic.to_lsp_diagnostic, diagnostics))
+
+    def schedule_diagnostics(
+        self, uri: str, changes: list[TextDocumentContentChangeEvent_Type1]
+    ) -> None:
+        """
+        Updates the diagnostics for the modified ranges of a document once it
+        stops changing, so that they are computed once for a series of quick
+        changes
+        """
+        ranges = self._pending_ranges.setdefault(uri, [])
+        for change in changes:
+            # Pending ranges were computed on the previous versions of the
+            # document, they must follow the text they cover
+            ranges[:] = [
+                rebase_range(x, change.range, change.text) for x in ranges
+            ]
+            ranges.append(
+                Range(
+                    start=change.range.start,
+                    end=text_end(change.range.start, change.text),
+                )
+            )
+        pending = self._pending_diagnostics.pop(uri, None)
+        if pending is not None:
+            pending.cancel()
+        self._pending_diagnostics[uri] = asyncio.get_running_loop().call_later(
+            DIAGNOSTICS_DELAY, self._flush_diagnostics, uri
+        )
+
+    def _flush_diagnostics(self, uri: str) -> None:
+        del self._pending_diagnostics[uri]
+        ranges = merge_ranges(self._pending_ranges.pop(uri, []))
+        if ranges:
+            task = asyncio.ensure_future(self.update_diagnostics(uri, ranges))
+            self._diagnostics_tasks.add(task)
+            task.add_done_callback(self._diagnostics_done)
+
+    def _diagnostics_done(self, task: asyncio.Task) -> None:
+        self._diagnostics_tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            log_debug(
+                "Diagnostic generation failed:\n"
+                + "".join(traceback.format_exception(error))
+            )
+
+    def cancel_pending_diagnostics(self, uri: str) -> None:
+        """
+        Drops the pending update of the diagnostics of a document, to use
+        when the whole document is about to be analyzed
+        """
+        pending = self._pending_diagnostics.pop(uri, None)
+        if pending is not None:
+            pending.cancel()
+        self._pending_ranges.pop(uri, None)
 
     def generate_completions(
         self, document: TextDocumentIdentifier, position: Position
@@ -105,35 +325,48 @@ class TrytonServer(LanguageServer):
         log_debug(
             f"Starting completion for {document.uri}, filter {completion_data.filter}"
         )
-        if completion_data.position == self._last_complete_position:
+        cache_key = (document.uri, completion_data.prefix)
+        if cache_key in self._completion_cache:
             log_debug(f"Used cached completion for {document.uri}")
+            self._completion_cache.move_to_end(cache_key)
         else:
-            self._last_completion_position = completion_data.position
-            document_path = Path(text_document.path)
-            self._last_completion = (
-                self.get_pool_manager().generate_completions(
-                    document_path,
-                    data=completion_data.source,
-                    line=position.line + 1,
-                    column=position.character,
-                )
+            document_path = self._get_document_path(text_document)
+            items = self.get_pool_manager().generate_completions(
+                document_path,
+                data=completion_data.source,
+                line=position.line + 1,
+                column=position.character,
             )
-        completions = self._last_completion
+            self._completion_cache[cache_key] = CachedCompletions(items)
+            if len(self._completion_cache) > COMPLETION_CACHE_SIZE:
+                self._completion_cache.popitem(last=False)
+        cached = self._completion_cache[cache_key]
+        completions = cached.items
         if not completions:
-            return CompletionList(is_incomplete=False, items=[])
+            return EMPTY_COMPLETIONS
         incomplete = False
         if completion_data.filter:
-            # Stupid implementation of fuzzy searching
-            target_regex = re.compile(
-                r".*".join(re.escape(x) for x in completion_data.filter)
-            )
-            completions = [
-                x for x in completions if re.search(target_regex, x.label)
-            ]
-        if len(completions) > 100:
+            # Basic fuzzy searching, only the best matches are kept
+            needle = completion_data.filter.lower()
+            scored = []
+            if cached.last_filter and needle.startswith(cached.last_filter):
+                # The filter was extended, only the previous matches can match
+                candidates = cached.last_matches
+            else:
+                # Only labels containing the first character can match
+                candidates = cached.indexes_per_char.get(needle[0], [])
+            for index in candidates:
+                score = fuzzy_score(needle, cached.labels[index])
+                if score is not None:
+                    scored.append((score, index, completions[index]))
+            cached.last_filter = needle
+            cached.last_matches = [x[1] for x in scored]
+            incomplete = len(scored) > 100
+            completions = [x[2] for x in heapq.nsmallest(100, scored)]
+        elif len(completions) > 100:
             completions = completions[:100]
             incomplete = True
-        result = CompletionList(is_incomplete=False, items=completions)
+        result = CompletionList(is_incomplete=incomplete, items=completions)
         log_debug(
             f"{'[PARTIAL] ' if incomplete else ''}Completed completion "
             f"for {document.uri} with {len(completions)} items"
@@ -149,29 +382,59 @@ class TrytonServer(LanguageServer):
         so we adjust the content of the last line to remove everything after
         (including) the dot to have somthing that can be parsed.
         """
-        lines = [x[:-1] for x in text_document.lines]
-        line_data = lines[position.line]
+        # Only the completed line is extracted, the rest of the source is
+        # used as is
+        source = text_document.source
+        line_start = 0
+        for _ in range(position.line):
+            line_start = source.index("\n", line_start) + 1
+        line_end = source.find("\n", line_start)
+        if line_end == -1:
+            line_end = len(source)
+        line_data = source[line_start:line_end]
         col = position.character - 1
         if line_data[col] == ".":
-            lines[position.line] = (
-                line_data[: col + 1] + "a" + line_data[col + 1 :]
-            )
+            insert_at = line_start + col + 1
+            source = source[:insert_at] + "a" + source[insert_at:]
             col += 1
-        for i in range(col):
-            if line_data[col - i] == ".":
-                col = col - i + 1
-                break
+        dot = line_data.rfind(".", 0, col + 1)
+        if dot != -1:
+            col = dot + 1
         return CompletionData(
-            "\n".join(lines), (position.line + 1, col), line_data[col:]
+            source, line_data[col:], source[: line_start + col]
         )
 
 
+class CachedCompletions:
+    def __init__(self, items: list[CompletionItem]):
+        super().__init__()
+        self.items = items
+        # Lower cased labels, for filtering
+        self.labels = [x.label.lower() for x in items]
+        # keys: a character
+        # values: indexes of the labels which contain it
+        self.indexes_per_char: dict[str, list[int]] = {}
+        for index, label in enumerate(self.labels):
+            for char in set(label):
+                self.indexes_per_char.setdefault(char, []).append(index)
+        # Last filter used, and the indexes of all the labels which matched
+        # it. Labels matching a longer filter are among them
+        self.last_filter = ""
+        self.last_matches: list[int] = []
+
+
 class CompletionData:
-    def __init__(self, source: str, position: tuple[int, int], filter: str):
+    def __init__(
+        self,
+        source: str,
+        filter: str,
+        prefix: str,
+    ):
         super().__init__()
         self.source = source
-        self.position = position
         self.filter = filter
+        # The source before the completed attribute
+        self.prefix = prefix
 
 
 def run() -> None:
@@ -185,9 +448,11 @@ def run() -> None:
     ) -> CompletionList | None:
         """Returns completion items."""
         if not params:
-            return None
-        return tryton_server.generate_completions(
-            params.text_document, params.position
+            return EMPTY_COMPLETIONS
+        return await tryton_server.run_in_worker(
+            tryton_server.generate_completions,
+            params.text_document,
+            params.position,
         )
 
     @tryton_server.feature(TEXT_DOCUMENT_DID_OPEN)
@@ -195,7 +460,8 @@ def run() -> None:
         ls: LanguageServer, params: DidOpenTextDocumentParams
     ) -> None:
         """Text document did open notification."""
-        tryton_server.generate_diagnostics(params.text_document.uri, [])
+        tryton_server.cancel_pending_diagnostics(params.text_document.uri)
+        await tryton_server.update_diagnostics(params.text_document.uri, [])
 
     @tryton_server.feature(TEXT_DOCUMENT_DID_SAVE)
     async def did_save(
@@ -204,8 +470,9 @@ def run() -> None:
         """Text document did change notification."""
         # On save we want to reset the server so that we have up to date
         # informations
-        tryton_server.reset_pool_manager()
-        tryton_server.generate_diagnostics(params.text_document.uri, [])
+        tryton_server.cancel_pending_diagnostics(params.text_document.uri)
+        await tryton_server.run_in_worker(tryton_server.reset_pool_manager)
+        await tryton_server.update_diagnostics(params.text_document.uri, [])
 
     @tryton_server.feature(TEXT_DOCUMENT_DID_CHANGE)
     async def did_change(
@@ -215,7 +482,7 @@ def run() -> None:
         # While the document is changed but not saved, we only update the
         # diagnostics for the current function for performances. Saving will
         # trigger a full diagnostic of the file
-        ranges = []
+        changes = []
         for content_change in params.content_changes:
             if (
                 isinstance(
@@ -223,10 +490,10 @@ def run() -> None:
                 )
                 and content_change.range
             ):
-                ranges.append(content_change.range)
-        if ranges:
-            tryton_server.generate_diagnostics(
-                params.text_document.uri, ranges
+                changes.append(content_change)
+        if changes:
+            tryton_server.schedule_diagnostics(
+                params.text_document.uri, changes
             )
 
     tryton_server.start_io()